@@ -7,13 +7,82 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: str
     DATABASE_URL: str
 
+    # SQLAlchemy connection pool. Async handlers run DB work on a thread
+    # pool of DB_POOL_SIZE + DB_MAX_OVERFLOW threads, one per connection.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Full-review fan-out limits
+    REVIEW_FETCH_CONCURRENCY: int = 8
+    REVIEW_LLM_CONCURRENCY: int = 4
+
+    # Worker-wide cap on concurrent Gemini generations
+    GEMINI_MAX_IN_FLIGHT: int = 16
+    # Ask Gemini for application/json output instead of free text
+    GEMINI_JSON_MODE: bool = True
+
+    # Shared VCS HTTP connection pool
+    HTTP2_ENABLED: bool = True
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # On-disk ETag / Last-Modified cache for VCS GETs
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_DIR: str = ".cache/http"
+    HTTP_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # In-process cache for the last-review GET endpoints. Writes invalidate
+    # it in this process; the TTL bounds staleness in other workers.
+    READ_CACHE_ENABLED: bool = True
+    READ_CACHE_MAX_ENTRIES: int = 10000
+    READ_CACHE_TTL_SECONDS: float = 30.0
+
+    # Directories listed concurrently while walking a Bitbucket tree
+    BITBUCKET_TREE_CONCURRENCY: int = 8
+
+    # Upstream rate limits and retry policy
+    GITHUB_REQUESTS_PER_SECOND: float = 10.0
+    BITBUCKET_REQUESTS_PER_SECOND: float = 5.0
+    GEMINI_REQUESTS_PER_SECOND: float = 5.0
+    UPSTREAM_RETRY_ATTEMPTS: int = 4
+    UPSTREAM_BACKOFF_BASE_SECONDS: float = 0.5
+    UPSTREAM_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # Files larger than this are split into chunks and reviewed in parts
+    REVIEW_CHUNK_MAX_TOKENS: int = 4000
+
+    # Small files are packed several to one LLM call in full reviews
+    REVIEW_BATCH_ENABLED: bool = True
+    REVIEW_BATCH_MAX_FILES: int = 8
+    REVIEW_BATCH_MAX_TOKENS: int = 3000
+    REVIEW_BATCH_FILE_MAX_TOKENS: int = 600
+
+    # Fetch files from one repository archive instead of per-file API calls
+    # when at least this many files need fetching (0 disables)
+    REVIEW_ARCHIVE_MIN_FILES: int = 20
+
+    # Content-addressed review cache
+    REVIEW_CACHE_ENABLED: bool = True
+    REVIEW_CACHE_MAX_ENTRIES: int = 50000
+    REVIEW_CACHE_TTL_DAYS: int = 30
+
+    # Keep each session's full response, zlib-compressed, in its own table
+    REVIEW_STORE_RAW_OUTPUT: bool = False
+
+    # Background review jobs. Set REVIEW_JOB_WORKERS=0 on API-only pods.
+    REVIEW_JOB_WORKERS: int = 2
+    REVIEW_JOB_POLL_SECONDS: float = 2.0
+    REVIEW_JOB_STALE_SECONDS: int = 600
+    # Running jobs touch updated_at this often; keep it well under STALE
+    REVIEW_JOB_HEARTBEAT_SECONDS: int = 60
 
     class Config:
         env_file = ".env"
    
 settings = Settings()
 
-print("GITHUB_TOKEN loaded:", bool(settings.GITHUB_TOKEN))
-print("BITBUCKET_USERNAME loaded:", bool(settings.BITBUCKET_USERNAME))
-print("BITBUCKET_TOKEN loaded:", bool(settings.BITBUCKET_TOKEN))
-
@@ -1,26 +1,37 @@
-from sqlalchemy import create_engine
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from dotenv import load_dotenv
 import os
 from urllib.parse import quote_plus
 
+from app.config import settings
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set")
 
-try:
-    engine = create_engine(DATABASE_URL)
-
-    # Force a real connection test
-    with engine.connect() as conn:
-        print("✅ Database connection successful")
+# Connects lazily on first use; see check_database for the readiness probe.
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 
-except Exception as e:
-    print("❌ Database connection failed")
-    print(f"Error: {e}")
-    raise 
+# One thread per pooled connection, so DB work from async code never
+# queues on a pool checkout while holding a thread.
+_db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    thread_name_prefix="db",
+)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -36,3 +47,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def check_database():
+    """Raises if the database can't be reached."""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def run_db(db: Session, fn, *args):
+    """
+    Run `fn(*args)` on the DB thread pool so a blocking query or commit
+    never stalls the event loop. Calls on the same session are run one
+    at a time, since a Session must not be used by two threads at once.
+    """
+    loop = asyncio.get_running_loop()
+    # Locks belong to one event loop; a session outliving its loop gets a new one
+    owner, lock = db.info.get("run_db_lock", (None, None))
+    if owner is not loop:
+        lock = asyncio.Lock()
+        db.info["run_db_lock"] = (loop, lock)
+    async with lock:
+        return await loop.run_in_executor(_db_executor, partial(fn, *args))
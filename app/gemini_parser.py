@@ -1,6 +1,8 @@
 import json
 import re
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+from app.review_result import FileReview, MalformedReviewError
 
 
 def _unwrap_once(text: str) -> str:
@@ -29,13 +31,51 @@ def _unwrap_once(text: str) -> str:
     return text
 
 
+_decoder = json.JSONDecoder()
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+def _fast_extract(text: str):
+    """
+    Single pass over the common shapes: a bare JSON object, or one inside
+    a ``` fence / surrounded by prose. `raw_decode` parses in place from
+    the first `{` and stops at the end of that object, so nothing is
+    copied or re-scanned. Returns None to fall back to the full pipeline.
+    """
+    start = _WHITESPACE.match(text).end()
+    if start < len(text) and text[start] != "{":
+        fence = text.find("```", start)
+        brace = text.find("{", start)
+        # Only skip ahead for fenced or prose-prefixed output; quoted or
+        # "text:"-prefixed payloads need the unwrapping below.
+        if brace == -1 or text[start] in "\"[" or (fence == -1 and text[start:start + 5].lower() == "text:"):
+            return None
+        start = brace
+
+    try:
+        parsed, _ = _decoder.raw_decode(text, start)
+    except (json.JSONDecodeError, IndexError):
+        return None
+
+    # {"text": "..."} envelopes are unwrapped by the full pipeline
+    if not isinstance(parsed, dict) or isinstance(parsed.get("text"), str):
+        return None
+    return parsed
+
+
 def extract_json_from_gemini(raw_text: str) -> Dict[str, Any]:
     """
-    Python equivalent of your full n8n parsing pipeline.
+    Python equivalent of your full n8n parsing pipeline, behind a
+    single-pass fast path for well-formed model output.
     """
     if not isinstance(raw_text, str):
         raw_text = str(raw_text)
 
+    parsed = _fast_extract(raw_text)
+    if parsed is not None:
+        return parsed
+
     text = raw_text.strip()
 
     # unwrap JSON-inside-JSON up to 2 levels
@@ -80,3 +120,63 @@ def extract_json_from_gemini(raw_text: str) -> Dict[str, Any]:
         "jsonChunk": None,
         "parseError": "No JSON object found",
     }
+
+
+def parse_file_review(raw_text: str) -> FileReview:
+    """
+    Parse and validate one file review from model output. Raises
+    MalformedReviewError when the output isn't JSON or doesn't match the
+    review schema, before anything downstream sees it.
+    """
+    parsed = extract_json_from_gemini(raw_text)
+    if isinstance(parsed, dict) and "parseError" in parsed:
+        raise MalformedReviewError(parsed["parseError"], raw_text)
+    try:
+        return FileReview.from_dict(parsed)
+    except MalformedReviewError as e:
+        e.raw_text = raw_text
+        raise
+
+
+def split_batch_review(raw_text: str, paths: List[str]) -> Dict[str, FileReview]:
+    """
+    Map each requested path to its review in a batched `{"files": [...]}`
+    answer. Entries are matched by path. When the model returned exactly
+    one entry per file, a path without a match takes the entry at its
+    position, but only if no entry matched by path at all or that entry
+    has no path; otherwise it may belong to another file. Paths that
+    can't be matched, or whose entry doesn't validate, are left out so
+    the caller can review them on their own.
+    """
+    parsed = extract_json_from_gemini(raw_text)
+    files = parsed.get("files") if isinstance(parsed, dict) else None
+    if not isinstance(files, list):
+        return {}
+
+    def validated(entry):
+        try:
+            return FileReview.from_dict(entry)
+        except MalformedReviewError:
+            return None
+
+    reviews = [validated(entry) for entry in files]
+    by_path = {
+        (review.path or "").lstrip("/"): review
+        for review in reviews
+        if review is not None
+    }
+
+    any_matched = any(path.lstrip("/") in by_path for path in paths)
+
+    split = {}
+    for position, path in enumerate(paths):
+        review = by_path.get(path.lstrip("/"))
+        if review is None and len(files) == len(paths):
+            candidate = reviews[position]
+            if candidate is not None and (
+                not any_matched or not (candidate.path or "").strip("/")
+            ):
+                review = candidate
+        if review is not None:
+            split[path] = review
+    return split
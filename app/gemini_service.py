@@ -1,12 +1,62 @@
-import google.generativeai as genai
 from app.config import settings
+from app.rate_limit import call_upstream, PrioritySemaphore
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
-for m in genai.list_models():
-    print(m.name, m.supported_generation_methods)
+MODEL_NAME = "models/gemini-2.5-flash"
 
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+_model = None
 
-def review_code(prompt: str) -> str:
-    response = model.generate_content(prompt)
-    return response.text
+
+def get_model():
+    """
+    The Gemini model, set up on first use. The SDK is imported here too,
+    so importing this module costs nothing and needs no network.
+    """
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        # JSON mode makes the model answer with a bare JSON object, so
+        # parsing is a single raw_decode on the parser's fast path.
+        _model = genai.GenerativeModel(
+            MODEL_NAME,
+            generation_config=(
+                {"response_mime_type": "application/json"}
+                if settings.GEMINI_JSON_MODE
+                else None
+            ),
+        )
+    return _model
+
+# Caps concurrent generations across the whole worker; callers beyond
+# the cap wait here and are counted in `queue_depth`. Interactive
+# callers get freed slots first, so full-review fan-out can't starve a
+# single-file review.
+_generation_slots = PrioritySemaphore(settings.GEMINI_MAX_IN_FLIGHT)
+
+_stats = {
+    "queue_depth": 0,
+    "in_flight": 0,
+}
+
+
+def gemini_stats() -> dict:
+    return {**_stats, "max_in_flight": settings.GEMINI_MAX_IN_FLIGHT}
+
+
+async def review_code(prompt: str) -> str:
+    _stats["queue_depth"] += 1
+    try:
+        await _generation_slots.acquire()
+    finally:
+        _stats["queue_depth"] -= 1
+
+    _stats["in_flight"] += 1
+    try:
+        response = await call_upstream(
+            "gemini", lambda: get_model().generate_content_async(prompt)
+        )
+        return response.text
+    finally:
+        _stats["in_flight"] -= 1
+        _generation_slots.release()
@@ -1,4 +1,4 @@
-import httpx
+from app.providers.http import http_get
 from app.config import settings
 
 GITHUB_API = "https://api.github.com"
@@ -10,14 +10,10 @@ headers = {
 
 async def get_file_content(owner, repo, ref, path):
     url = f"{GITHUB_API}/repos/{owner}/{repo}/contents/{path}?ref={ref}"
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers)
-        r.raise_for_status()
-        return r.json()
+    r = await http_get("github", url, headers)
+    return r.json()
 
 async def get_repo_tree(owner, repo, ref):
     url = f"{GITHUB_API}/repos/{owner}/{repo}/git/trees/{ref}?recursive=1"
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers)
-        r.raise_for_status()
-        return r.json()["tree"]
+    r = await http_get("github", url, headers)
+    return r.json()["tree"]
@@ -2,36 +2,72 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from app.models import ReviewRequest
 from app.github_service import get_file_content, get_repo_tree
-from app.gemini_service import review_code
-from app.review_builders import build_file_prompt, build_project_prompt
+from app.gemini_service import gemini_stats
+from app.review_builders import build_file_prompts, PROMPT_ID
 from app.providers.factory import get_provider
+from app.providers.http import close_http_client
+from app.providers.http_cache import http_cache_stats
+from app.path import detect_language, get_path_filter
+from app.review_pipeline import (
+    review_project_files,
+    review_prompts,
+    list_reviewable_entries,
+    stream_full_review,
+)
+from app.review_aggregate import ProjectAggregate
+from app.review_cache import cache_stats
+from app.rate_limit import rate_limit_stats
+from app.review_jobs import submit_review_job, job_to_dict, start_review_workers
+from app.projects import project_name, get_project_id
+from app.read_cache import cached_read, read_cache_stats
 import base64
 import base64
 from pathlib import Path
-from app.gemini_parser import extract_json_from_gemini
 from pathlib import Path
-from app.review_persistence import save_file_review, save_full_review
+from app.review_persistence import (
+    save_file_review,
+    save_full_review,
+    load_unchanged_file_reviews,
+    load_session_summary,
+    load_raw_output,
+)
 from fastapi import Depends
-from sqlalchemy.orm import Session
-from app.database import Base, get_db
-from app.database import engine
-from app.models import Base
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db, check_database, run_db
 from app.models import (
-    Base,
     ReviewRequest,
     ReviewFile,
     ReviewSession,
+    ReviewJob,
 )
 
-Base.metadata.create_all(bind=engine)
+# Nothing here touches the network or the database at import; the schema
+# is created by `python -m app.migrate` (see README), the Gemini model on
+# first use, and DB connections on first request.
 
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
 import logging
+from contextlib import asynccontextmanager
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Project Review API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = start_review_workers()
+    app.state.started = True
+    yield
+    app.state.started = False
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await close_http_client()
+
+
+app = FastAPI(title="AI Project Review API", lifespan=lifespan)
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request, exc):
@@ -49,75 +85,15 @@ app.add_middleware(
 )
 
 
-# Code + config files worth reviewing
-REVIEWABLE_EXTENSIONS = {
-    ".js", ".ts", ".jsx", ".tsx",
-    ".py", ".java", ".kt", ".go",
-    ".rs", ".cpp", ".c", ".cs",
-    ".php", ".rb", ".swift",
-    ".html", ".css", ".scss",
-    ".json", ".yml", ".yaml",
-    ".md", ".sh"
-}
-
-# Directories we NEVER want to review
-EXCLUDED_DIRS = {
-    "node_modules",
-    "dist",
-    "build",
-    "out",
-    "coverage",
-    ".next",
-    ".git",
-    "vendor",
-    "__pycache__",
-}
-
-EXTENSION_LANGUAGE_MAP = {
-    ".js": "javascript",
-    ".ts": "typescript",
-    ".jsx": "javascript",
-    ".tsx": "typescript",
-    ".py": "python",
-    ".java": "java",
-    ".kt": "kotlin",
-    ".go": "go",
-    ".rs": "rust",
-    ".cpp": "cpp",
-    ".c": "c",
-    ".cs": "csharp",
-    ".php": "php",
-    ".rb": "ruby",
-    ".swift": "swift",
-    ".html": "html",
-    ".css": "css",
-    ".scss": "scss",
-    ".json": "json",
-    ".yml": "yaml",
-    ".yaml": "yaml",
-    ".md": "markdown",
-    ".sh": "shell",
-}
-
-def detect_language(path: str) -> str:
-    return EXTENSION_LANGUAGE_MAP.get(
-        Path(path).suffix.lower(),
-        "text",
-    )
-
-def is_reviewable_file(path: str) -> bool:
-    p = Path(path)
-
-    # Exclude junk directories
-    for part in p.parts:
-        if part in EXCLUDED_DIRS:
-            return False
-
-    # Exclude files without extensions (except known cases)
-    if p.suffix == "":
-        return False
+async def _reviewable_entries(provider, req: ReviewRequest):
+    try:
+        return await list_reviewable_entries(
+            provider, req.owner, req.repo, req.ref, get_path_filter(req.include, req.exclude)
+        )
+    except Exception:
+        logger.exception("Repo tree fetch failed")
+        raise HTTPException(status_code=502, detail="Failed to fetch repository tree")
 
-    return p.suffix.lower() in REVIEWABLE_EXTENSIONS
 
 @app.post("/review")
 async def review(req: ReviewRequest, db: Session = Depends(get_db)):
@@ -133,7 +109,7 @@ async def review(req: ReviewRequest, db: Session = Depends(get_db)):
         for f in req.files:
             language = detect_language(f.filename)
 
-            prompt = build_file_prompt(
+            prompts = build_file_prompts(
                 owner="local",
                 repo="local",
                 ref="local",
@@ -143,19 +119,19 @@ async def review(req: ReviewRequest, db: Session = Depends(get_db)):
             )
 
             try:
-                raw_review = review_code(prompt)
-                parsed = extract_json_from_gemini(raw_review)
+                file_review = await review_prompts(prompts)
             except Exception:
                 logger.exception("Gemini processing failed")
                 raise HTTPException(status_code=502, detail="AI review service failed")
 
+            parsed = file_review.to_dict()
             response = {
                 "project": "local",
                 "mode": "file",
                 "filename": f.filename,
                 "path": f.path,
-                "overallProjectScore": parsed.get("overallFileScore", 0),
-                "topIssues": parsed.get("issues", []),
+                "overallProjectScore": file_review.overall_file_score or 0,
+                "topIssues": parsed["issues"],
                 "file": parsed,
             }
 
@@ -188,7 +164,7 @@ async def review(req: ReviewRequest, db: Session = Depends(get_db)):
 
             language = detect_language(req.filename)
 
-            prompt = build_file_prompt(
+            prompts = build_file_prompts(
                 owner=req.owner,
                 repo=req.repo,
                 ref=req.ref,
@@ -198,103 +174,134 @@ async def review(req: ReviewRequest, db: Session = Depends(get_db)):
             )
 
             try:
-                raw_review = review_code(prompt)
-                file_review = extract_json_from_gemini(raw_review)
+                file_review = await review_prompts(prompts)
             except Exception:
                 logger.exception("Gemini processing failed")
                 raise HTTPException(status_code=502, detail="AI review service failed")
 
+            parsed = file_review.to_dict()
             response = {
-                "project": f"{req.provider}:{req.owner}/{req.repo}@{req.ref}",
+                "project": project_name(req.provider, req.owner, req.repo, req.ref),
                 "mode": "file",
                 "filename": req.filename,
-                "overallProjectScore": file_review.get("overallFileScore", 0),
-                "topIssues": file_review.get("issues", []),
-                "file": file_review,
+                "overallProjectScore": file_review.overall_file_score or 0,
+                "topIssues": parsed["issues"],
+                "file": parsed,
             }
 
-            save_file_review(db, response)
+            await run_db(db, save_file_review, db, response, file_review)
             return response
 
         # ---------- FULL PROJECT REVIEW ----------
-        try:
-            tree = await provider.get_repo_tree(req.owner, req.repo, req.ref)
-        except Exception:
-            logger.exception("Repo tree fetch failed")
-            raise HTTPException(status_code=502, detail="Failed to fetch repository tree")
+        entries = await _reviewable_entries(provider, req)
+        project = project_name(req.provider, req.owner, req.repo, req.ref)
+
+        # Incremental mode: carry forward stored reviews for files whose
+        # blob sha is unchanged and only send the rest through the pipeline.
+        unchanged = (
+            await run_db(db, load_unchanged_file_reviews, db, project, entries)
+            if req.incremental
+            else {}
+        )
 
-        results = []
-        all_issues = []
-        scores = []
+        reviewed = await review_project_files(
+            db,
+            provider,
+            req.provider,
+            req.owner,
+            req.repo,
+            req.ref,
+            [e for e in entries if e["path"].lstrip("/") not in unchanged],
+        )
+        by_path = {**unchanged, **{r.path.lstrip("/"): r for r in reviewed}}
 
-        for item in tree:
-            if item["type"] != "blob":
-                continue
+        results = [
+            by_path[e["path"].lstrip("/")]
+            for e in entries
+            if e["path"].lstrip("/") in by_path
+        ]
 
-            path = item["path"]
-            if not is_reviewable_file(path):
-                continue
+        aggregate = ProjectAggregate()
+        for file_review in results:
+            aggregate.add(file_review)
 
-            try:
-                raw = await provider.get_file_content(req.owner, req.repo, req.ref, path)
+        full_response = {
+            **aggregate.summary(project),
+            "filesCarriedForward": len(unchanged),
+            "files": [r.to_dict() for r in results],
+        }
 
-                if req.provider == "github":
-                    content = base64.b64decode(raw["content"]).decode("utf-8", errors="ignore")
-                else:
-                    content = raw
+        await run_db(db, save_full_review, db, full_response, results)
+        return full_response
 
-                language = detect_language(path)
+    except HTTPException:
+        raise
 
-                prompt = build_project_prompt(
-                    owner=req.owner,
-                    repo=req.repo,
-                    ref=req.ref,
-                    filename=path,
-                    language=language,
-                    content=content,
-                )
 
-                raw_review = review_code(prompt)
-                parsed = extract_json_from_gemini(raw_review)
+@app.post("/review/stream")
+async def review_stream(req: ReviewRequest, db: Session = Depends(get_db)):
+    """
+    Streaming variant of a full review. Emits NDJSON, one line per
+    reviewed file as soon as it is ready, then a final summary line
+    (see stream_full_review for the event shapes).
+    """
+    if req.action != "full" or req.mode == "local":
+        raise HTTPException(status_code=400, detail="Streaming is only supported for remote full reviews")
 
-                results.append(parsed)
-                all_issues.extend(parsed.get("issues", []))
-                if "overallFileScore" in parsed:
-                    scores.append(parsed["overallFileScore"])
+    provider = get_provider(req.provider, req.accessToken)
+    entries = await _reviewable_entries(provider, req)
 
-            except Exception:
-                logger.exception(f"Failed reviewing file: {path}")
-                continue
+    async def lines():
+        async for event in stream_full_review(db, provider, req, entries):
+            yield json.dumps(event) + "\n"
 
-        overall_project_score = sum(scores) // len(scores) if scores else 0
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-        def avg(values):
-            return round(sum(values) / len(values)) if values else 0
 
-        metrics_list = [f.get("metrics", {}) for f in results]
+@app.post("/reviews/jobs", status_code=202)
+def create_review_job(req: ReviewRequest, db: Session = Depends(get_db)):
+    if req.action != "full" or req.mode == "local":
+        raise HTTPException(status_code=400, detail="Jobs are only supported for remote full reviews")
 
-        full_metrics = {
-            "complexity": avg([m.get("complexity", 0) for m in metrics_list]),
-            "readability": avg([m.get("readability", 0) for m in metrics_list]),
-            "testCoverageEstimate": avg([m.get("testCoverageEstimate", 0) for m in metrics_list]),
-            "documentationScore": avg([m.get("documentationScore", 0) for m in metrics_list]),
-        }
+    job = submit_review_job(db, req)
+    return {"jobId": job.id, "status": job.status.value}
 
-        full_response = {
-            "project": f"{req.provider}:{req.owner}/{req.repo}@{req.ref}",
-            "mode": "full",
-            "overallProjectScore": overall_project_score,
-            "filesReviewed": len(results),
-            "file": {"metrics": full_metrics},
-            "topIssues": all_issues[:20],
-            "files": results,
-        }
 
-        save_full_review(db, full_response)
-        return full_response
+@app.get("/reviews/jobs/{job_id}")
+def get_review_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(ReviewJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
 
-    except HTTPException:
-        raise
+
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    if not getattr(app.state, "started", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    try:
+        check_database()
+    except Exception:
+        logger.exception("Readiness check failed")
+        return JSONResponse(status_code=503, content={"status": "database unavailable"})
+    return {"status": "ok"}
+
+
+@app.get("/stats")
+def get_stats():
+    return {
+        "gemini": gemini_stats(),
+        "review_cache": cache_stats(),
+        "prompt": {"id": PROMPT_ID},
+        "upstreams": rate_limit_stats(),
+        "http_cache": http_cache_stats(),
+        "read_cache": read_cache_stats(),
+    }
 
 
 # Last Review Retrieval Endpoint
@@ -307,13 +314,22 @@ def get_last_review(
     filename: str,
     db: Session = Depends(get_db),
 ):
-    project = f"{provider}:{owner}/{repo}@{ref}"
+    project = project_name(provider, owner, repo, ref)
+    return cached_read(
+        "last", project, filename, lambda: _last_review(db, project, filename)
+    )
+
 
-    file = (
+def _last_review(db: Session, project: str, filename: str) -> dict:
+    project_id = get_project_id(db, project)
+
+    # Issues and metrics come back in the same query
+    file = project_id and (
         db.query(ReviewFile)
+        .options(joinedload(ReviewFile.issues), joinedload(ReviewFile.metrics))
         .join(ReviewSession)
         .filter(
-            ReviewSession.project == project,
+            ReviewFile.project_id == project_id,
             ReviewFile.filename == filename,
         )
         .order_by(ReviewSession.created_at.desc())
@@ -357,26 +373,39 @@ def get_last_full_review(
     ref: str,
     db: Session = Depends(get_db),
 ):
-    project = f"{provider}:{owner}/{repo}@{ref}"
+    project = project_name(provider, owner, repo, ref)
+    return cached_read(
+        "full_last", project, None, lambda: _last_full_review(db, project)
+    )
 
-    session = (
+
+def _last_full_review(db: Session, project: str) -> dict:
+    project_id = get_project_id(db, project)
+
+    session = project_id and (
         db.query(ReviewSession)
         .filter(
-            ReviewSession.project == project,
-            ReviewSession.mode == "full"
+            ReviewSession.project_id == project_id,
+            ReviewSession.mode == "full",
+            # Only finished reviews: streams and jobs create their session
+            # before any file is reviewed and summarize it at the end.
+            # Sessions from before the summary columns only have raw_response.
+            or_(
+                ReviewSession.files_reviewed.isnot(None),
+                ReviewSession.raw_response.isnot(None),
+            ),
         )
         .order_by(ReviewSession.created_at.desc())
         .first()
     )
 
-    if not session or not session.raw_response:
+    summary = load_session_summary(session) if session else None
+    if not summary:
         return {"exists": False, "message": "No previous full review found."}
 
-    raw = session.raw_response
-
-    metrics = raw.get("file", {}).get("metrics", {})
-    top_issues = raw.get("topIssues", [])
-    overall = raw.get("overallProjectScore", 0)
+    metrics = summary["metrics"]
+    top_issues = summary["topIssues"]
+    overall = summary["overallProjectScore"]
 
     return {
         "exists": True,
@@ -393,6 +422,14 @@ def get_last_full_review(
     }
 
 
+@app.get("/reviews/sessions/{session_id}/raw")
+def get_review_raw_output(session_id: int, db: Session = Depends(get_db)):
+    raw = load_raw_output(db, session_id)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="No raw output stored for this session")
+    return raw
+
+
 @app.get("/reviews/files")
 def list_reviewed_files(
     provider: str,
@@ -401,14 +438,18 @@ def list_reviewed_files(
     ref: str,
     db: Session = Depends(get_db),
 ):
-    project = f"{provider}:{owner}/{repo}@{ref}"
+    project = project_name(provider, owner, repo, ref)
+    return cached_read("files", project, None, lambda: _reviewed_files(db, project))
+
+
+def _reviewed_files(db: Session, project: str) -> dict:
+    project_id = get_project_id(db, project)
     files = (
         db.query(ReviewFile.filename)
-        .join(ReviewSession)
-        .filter(ReviewSession.project == project)
+        .filter(ReviewFile.project_id == project_id)
         .distinct()
         .all()
-    )
+    ) if project_id else []
 
     return {
         "project": project,
@@ -0,0 +1,96 @@
+"""
+One-off schema step, run once per deploy before the app starts serving:
+
+    python -m app.migrate
+
+Creates missing tables, adds the columns and indexes the models have
+gained since a table was created, relaxes NOT NULL where the model now
+allows NULL, then backfills project ids on rows written before the
+projects table. Every step checks the live schema first, so it is safe
+to run repeatedly.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn, Table
+
+from app.database import engine, SessionLocal
+from app.models import Base
+from app.projects import backfill_project_ids
+
+
+def _column_ddl(conn: Connection, table: Table, name: str) -> str:
+    column = table.c[name]
+    ddl = str(CreateColumn(column).compile(dialect=conn.dialect))
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+    return ddl
+
+
+def _add_missing_columns(conn: Connection, table: Table, existing: dict):
+    for column in table.columns:
+        if column.name not in existing:
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(conn, table, column.name)}"
+            ))
+
+
+def _rebuild_sqlite_table(conn: Connection, table: Table, existing: dict):
+    # SQLite can't alter a column in place: copy the rows into a table
+    # created from the model. legacy_alter_table keeps the rename from
+    # repointing other tables' foreign keys at the old copy.
+    old = f"_old_{table.name}"
+    columns = ", ".join(c.name for c in table.columns if c.name in existing)
+    conn.execute(text("PRAGMA legacy_alter_table = ON"))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    conn.execute(text("PRAGMA legacy_alter_table = OFF"))
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    table.create(conn)
+    conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+
+def _relax_not_null(conn: Connection, table: Table, existing: dict):
+    relaxed = [
+        c.name for c in table.columns
+        if c.nullable and not c.primary_key
+        and c.name in existing and not existing[c.name]["nullable"]
+    ]
+    if not relaxed:
+        return
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(conn, table, existing)
+        return
+    for name in relaxed:
+        conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL"))
+
+
+def _create_missing_indexes(conn: Connection, table: Table):
+    existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(conn)
+
+
+def upgrade_tables(conn: Connection):
+    """Bring tables created by older versions up to the current models."""
+    for table in Base.metadata.sorted_tables:
+        inspector = inspect(conn)
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"]: c for c in inspector.get_columns(table.name)}
+        _add_missing_columns(conn, table, existing)
+        _relax_not_null(conn, table, existing)
+        _create_missing_indexes(conn, table)
+
+
+def migrate():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        upgrade_tables(conn)
+    with SessionLocal() as db:
+        backfill_project_ids(db)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -3,9 +3,9 @@ from typing import Optional, Literal, List
 import enum
 from sqlalchemy import (
     Column, Integer, BigInteger, String, Text, ForeignKey,
-    Enum, TIMESTAMP, JSON, UniqueConstraint
+    Enum, TIMESTAMP, JSON, UniqueConstraint, LargeBinary, Index
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -21,36 +21,83 @@ class SeverityLevel(enum.Enum):
     major = "major"
     minor = "minor"
 
+class JobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
 
 # ---------- TABLES ----------
 
+class Project(Base):
+    """One row per provider/owner/repo/ref; sessions and files point here."""
+    __tablename__ = "projects"
+    __table_args__ = (
+        UniqueConstraint("provider", "owner", "repo", "ref", name="uq_project_ref"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    provider = Column(String(32), nullable=False)
+    owner = Column(String(255), nullable=False)
+    repo = Column(String(255), nullable=False)
+    ref = Column(String(255), nullable=False)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
 class ReviewSession(Base):
     __tablename__ = "review_sessions"
+    __table_args__ = (
+        # Latest session of a project (and mode) without a sort
+        Index("ix_review_sessions_project_mode_created", "project_id", "mode", "created_at"),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    project = Column(String(255), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    # "provider:owner/repo@ref"; only set on sessions from before the
+    # projects table, until backfill_project_ids has run
+    project = Column(String(255))
 
     mode = Column(Enum(ReviewMode, name="review_mode_enum"), nullable=False)
 
     overall_score = Column(Integer)
-    raw_response = Column(JSON)
+    prompt_version = Column(String(32))
+    model_name = Column(String(64))
+
+    # Constant-size summary: aggregated metrics and at most
+    # TOP_ISSUES_LIMIT issues, whatever the size of the project
+    files_reviewed = Column(Integer)
+    metrics = Column(JSON)
+    top_issues = Column(JSON)
+
+    # Whole response, only set on sessions written before the summary
+    # columns existed. Deferred so session reads never load it.
+    raw_response = deferred(Column(JSON))
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     files = relationship("ReviewFile", back_populates="session", cascade="all, delete")
+    raw_output = relationship(
+        "ReviewRawOutput", uselist=False, cascade="all, delete-orphan"
+    )
 
 
 class ReviewFile(Base):
     __tablename__ = "review_files"
     __table_args__ = (
         UniqueConstraint("session_id", "filename", name="uq_session_filename"),
+        # Project + filename lookups, without going through sessions
+        Index("ix_review_files_project_filename", "project_id", "filename"),
     )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     session_id = Column(BigInteger, ForeignKey("review_sessions.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"))
 
     filename = Column(String(500), nullable=False)
     language = Column(String(50))
     file_score = Column(Integer)
+    content_sha = Column(String(40))
 
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -65,7 +112,7 @@ class ReviewIssue(Base):
     __tablename__ = "review_issues"
 
     id = Column(Integer, primary_key=True)
-    file_id = Column(Integer, ForeignKey("review_files.id"))
+    file_id = Column(Integer, ForeignKey("review_files.id"), index=True)
 
     start_line = Column(Integer)
     end_line = Column(Integer)
@@ -81,7 +128,7 @@ class ReviewSuggestion(Base):
     __tablename__ = "review_suggestions"
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    file_id = Column(BigInteger, ForeignKey("review_files.id"), nullable=False)
+    file_id = Column(BigInteger, ForeignKey("review_files.id"), nullable=False, index=True)
 
     title = Column(String(255))
     explanation = Column(Text)
@@ -98,6 +145,47 @@ class ReviewMetric(Base):
     test_coverage_estimate = Column(Integer)
     documentation_score = Column(Integer)
 
+
+class ReviewRawOutput(Base):
+    """Compressed full response of a session, kept only when REVIEW_STORE_RAW_OUTPUT is on."""
+    __tablename__ = "review_raw_outputs"
+
+    session_id = Column(BigInteger, ForeignKey("review_sessions.id"), primary_key=True)
+    # zlib-compressed JSON
+    payload = Column(LargeBinary, nullable=False)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class ReviewCacheEntry(Base):
+    __tablename__ = "review_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    result = Column(JSON, nullable=False)
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    last_used_at = Column(TIMESTAMP, server_default=func.now(), index=True)
+
+class ReviewJob(Base):
+    __tablename__ = "review_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(Enum(JobStatus, name="review_job_status_enum"), nullable=False, index=True)
+
+    # The submitted ReviewRequest, so a job can be picked up again after a restart
+    request = Column(JSON, nullable=False)
+
+    files_total = Column(Integer, default=0)
+    files_done = Column(Integer, default=0)
+    errors = Column(JSON, default=list)
+    result = Column(JSON)
+
+    # Set on each claim; a worker only writes to the job while it still holds it
+    claim_token = Column(String(36))
+
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
 class LocalReviewFile(BaseModel):
     filename: str
     path: str  
@@ -127,6 +215,11 @@ class ReviewRequest(BaseModel):
     filename: Optional[str] = None
     files: Optional[List[ReviewFileInput]] = None
     localProjectId: Optional[str] = None
+    incremental: bool = False
+    # Extra path rules for full reviews: include globs, and .gitignore-style
+    # exclude rules (`!` re-includes)
+    include: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None
 
     @model_validator(mode="after")
     def validate_context(self):
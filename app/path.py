@@ -1,3 +1,30 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# Code + config files worth reviewing
+REVIEWABLE_EXTENSIONS = {
+    ".js", ".ts", ".jsx", ".tsx",
+    ".py", ".java", ".kt", ".go",
+    ".rs", ".cpp", ".c", ".cs",
+    ".php", ".rb", ".swift",
+    ".html", ".css", ".scss",
+    ".json", ".yml", ".yaml",
+    ".md", ".sh"
+}
+
+# Directories we NEVER want to review
+EXCLUDED_DIRS = {
+    "node_modules",
+    "dist",
+    "build",
+    "out",
+    "coverage",
+    ".next",
+    ".git",
+    "vendor",
+    "__pycache__",
+}
 
 EXTENSION_LANGUAGE_MAP = {
     ".js": "javascript",
@@ -24,3 +51,166 @@ EXTENSION_LANGUAGE_MAP = {
     ".md": "markdown",
     ".sh": "shell",
 }
+
+
+def detect_language(path: str) -> str:
+    return EXTENSION_LANGUAGE_MAP.get(
+        Path(path).suffix.lower(),
+        "text",
+    )
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """
+    Translate one .gitignore-style pattern (without `!`) to a regex over
+    repo-relative paths. A pattern also matches everything beneath a
+    matching directory; a trailing `/` only matches directories, and a
+    pattern containing `/` is anchored to the repository root.
+    """
+    dir_only = pattern.endswith("/")
+    pattern = pattern.strip("/") if dir_only else pattern
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                out.append(pattern[i:end + 1])
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/.*" if dir_only else "(?:/.*)?"
+    return f"{prefix}{''.join(out)}{suffix}"
+
+
+class PathFilter:
+    """
+    Compiled reviewable-path matcher.
+
+    The default EXCLUDED_DIRS, the user's exclude rules and the user's
+    include globs are each compiled into one regex, so a path is checked
+    with a set lookup and at most three regex matches. Exclude rules
+    follow .gitignore semantics (last matching rule wins, `!` re-includes);
+    include globs, when given, must match for a file to be reviewed.
+    """
+
+    _EXCLUDED_DIRS_RE = re.compile(
+        "(?:^|/)(?:" + "|".join(re.escape(d) for d in sorted(EXCLUDED_DIRS)) + ")(?:/|$)"
+    )
+
+    def __init__(self, include=None, exclude=None):
+        self._include = (
+            re.compile("|".join(f"(?:{_glob_to_regex(p)})" for p in include))
+            if include
+            else None
+        )
+
+        rules = [
+            (line.startswith("!"), _glob_to_regex(line.lstrip("!")))
+            for line in (l.strip() for l in exclude or [])
+            if line and not line.startswith("#")
+        ]
+        if any(negated for negated, _ in rules):
+            # Order matters once rules can re-include; evaluate one by one.
+            self._exclude = None
+            self._ordered_rules = [(negated, re.compile(rx)) for negated, rx in rules]
+        else:
+            self._exclude = re.compile("|".join(f"(?:{rx})" for _, rx in rules)) if rules else None
+            self._ordered_rules = None
+
+    def _excluded_by_rules(self, path: str) -> bool:
+        if self._exclude is not None:
+            return self._exclude.fullmatch(path) is not None
+        if self._ordered_rules is None:
+            return False
+
+        excluded = False
+        for negated, rule in self._ordered_rules:
+            if rule.fullmatch(path):
+                excluded = not negated
+        return excluded
+
+    def allows_dir(self, path: str) -> bool:
+        """False when nothing under the directory can be reviewed."""
+        path = path.strip("/")
+        if self._EXCLUDED_DIRS_RE.search(path):
+            return False
+        # Negated rules could re-include something below; only prune on
+        # a rule set without them.
+        return self._ordered_rules is not None or not (
+            self._exclude is not None and self._exclude.fullmatch(path + "/")
+        )
+
+    def allows_file(self, path: str) -> bool:
+        path = path.lstrip("/")
+        dot = path.rfind(".")
+        # No extension, or a dotfile such as ".env" (same as Path.suffix)
+        if dot <= 0 or path[dot - 1] == "/" or "/" in path[dot:]:
+            return False
+        if path[dot:].lower() not in REVIEWABLE_EXTENSIONS:
+            return False
+        if self._EXCLUDED_DIRS_RE.search(path):
+            return False
+        if self._excluded_by_rules(path):
+            return False
+        return self._include is None or self._include.fullmatch(path) is not None
+
+    def filter_tree(self, entries):
+        """
+        Yield reviewable blob entries. Entries of a pruned directory that
+        directly follow it (depth-first listings such as GitHub's
+        recursive tree) are skipped with a single prefix check.
+        """
+        pruned = None
+        for entry in entries:
+            path = entry["path"]
+            if pruned is not None:
+                if path.startswith(pruned):
+                    continue
+                pruned = None
+
+            if entry["type"] == "tree":
+                if not self.allows_dir(path):
+                    pruned = path.rstrip("/") + "/"
+            elif entry["type"] == "blob" and self.allows_file(path):
+                yield entry
+
+
+DEFAULT_PATH_FILTER = PathFilter()
+
+
+@lru_cache(maxsize=128)
+def _cached_path_filter(include: tuple, exclude: tuple) -> PathFilter:
+    return PathFilter(include=list(include), exclude=list(exclude))
+
+
+def get_path_filter(include=None, exclude=None) -> PathFilter:
+    """Compiled filter for a rule set, reused across requests."""
+    if not include and not exclude:
+        return DEFAULT_PATH_FILTER
+    return _cached_path_filter(tuple(include or ()), tuple(exclude or ()))
+
+
+def is_reviewable_file(path: str) -> bool:
+    return DEFAULT_PATH_FILTER.allows_file(path)
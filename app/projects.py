@@ -0,0 +1,82 @@
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Project, ReviewSession, ReviewFile
+
+# "provider:owner/repo@ref" -> projects.id. Only committed ids are
+# cached and ids never change, so entries can't go stale.
+_project_ids: dict[str, int] = {}
+
+
+def project_name(provider: str, owner: str, repo: str, ref: str) -> str:
+    return f"{provider}:{owner}/{repo}@{ref}"
+
+
+def _split_project_name(name: str) -> dict:
+    provider, _, rest = name.partition(":")
+    owner, _, rest = rest.partition("/")
+    repo, _, ref = rest.partition("@")
+    return {"provider": provider, "owner": owner, "repo": repo, "ref": ref}
+
+
+def get_project_id(db: Session, name: str) -> int | None:
+    """Id of an existing project, or None if it was never reviewed."""
+    project_id = _project_ids.get(name)
+    if project_id is None:
+        project_id = db.scalar(
+            select(Project.id).filter_by(**_split_project_name(name))
+        )
+        if project_id is not None:
+            _project_ids[name] = project_id
+    return project_id
+
+
+def resolve_project_id(db: Session, name: str) -> int:
+    """
+    Id of the project, creating it if needed. The row is committed on its
+    own connection so the id stays valid even if the caller rolls back.
+    """
+    project_id = get_project_id(db, name)
+    if project_id is not None:
+        return project_id
+
+    with Session(db.get_bind()) as own:
+        own.add(Project(**_split_project_name(name)))
+        try:
+            own.commit()
+        except IntegrityError:
+            # Another worker created it first
+            own.rollback()
+
+    return get_project_id(db, name)
+
+
+def backfill_project_ids(db: Session):
+    """
+    Point sessions and files written before the projects table at their
+    project. A no-op once every row has a project_id.
+    """
+    rows = db.execute(
+        select(ReviewSession.id, ReviewSession.project)
+        .where(ReviewSession.project_id.is_(None), ReviewSession.project.isnot(None))
+    ).all()
+
+    # Create every project before this session starts writing
+    project_ids = {name: resolve_project_id(db, name) for name in {name for _, name in rows}}
+    if rows:
+        db.execute(
+            update(ReviewSession),
+            [{"id": session_id, "project_id": project_ids[name]} for session_id, name in rows],
+        )
+
+    db.execute(
+        update(ReviewFile)
+        .where(ReviewFile.project_id.is_(None))
+        .values(
+            project_id=select(ReviewSession.project_id)
+            .where(ReviewSession.id == ReviewFile.session_id)
+            .scalar_subquery()
+        )
+    )
+    db.commit()
@@ -0,0 +1,151 @@
+import asyncio
+import io
+import queue
+import tarfile
+import threading
+
+from app.providers.http import get_http_client
+from app.rate_limit import call_upstream, get_limiter
+
+ARCHIVE_CHUNK_BYTES = 64 * 1024
+
+# Chunks buffered between the download and the extracting thread
+ARCHIVE_QUEUE_CHUNKS = 32
+
+# Extracted files buffered between the extracting thread and the consumer
+ARCHIVE_QUEUE_FILES = 16
+
+# Marks the end of the archive on the output queue
+_ARCHIVE_DONE = object()
+
+
+class _ArchiveClosed(Exception):
+    """The consumer stopped reading; ends extraction early."""
+
+
+class _QueueReader(io.RawIOBase):
+    """Blocking file object over byte chunks fed from the event loop."""
+
+    def __init__(self, chunks: queue.Queue):
+        self._chunks = chunks
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer = chunk
+
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def drain(self):
+        # Keep consuming so the producer never blocks on a full queue
+        while not self._eof:
+            if self._chunks.get() is None:
+                self._eof = True
+
+
+def _extract_tar(reader: _QueueReader, wanted: set[str], deliver):
+    with tarfile.open(fileobj=io.BufferedReader(reader), mode="r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            # Archives wrap everything in a single "<repo>-<sha>/" directory
+            _, _, path = member.name.partition("/")
+            if path not in wanted:
+                continue
+
+            f = tar.extractfile(member)
+            if f is not None:
+                deliver(path, f.read().decode("utf-8", errors="ignore"))
+
+
+async def iter_archive_files(upstream: str, url: str, headers: dict, wanted: set[str]):
+    """
+    Stream a tar(.gz) repository archive and yield `(path, text)` for the
+    files in `wanted` as they are extracted. The archive is never written
+    to disk: chunks are handed to a worker thread that extracts as they
+    arrive, and everything outside `wanted` is skipped. Download,
+    extraction and the consumer are linked by bounded queues, so a
+    consumer that falls behind pauses the download instead of buffering
+    the repository. Only opening the download is retried; a failure
+    halfway raises after the files already yielded.
+    """
+    async def open_archive():
+        client = get_http_client()
+        r = await client.send(
+            client.build_request("GET", url, headers=headers),
+            stream=True,
+            follow_redirects=True,
+        )
+        get_limiter(upstream).observe(r.headers)
+        if r.is_error:
+            await r.aclose()
+            r.raise_for_status()
+        return r
+
+    response = await call_upstream(upstream, open_archive)
+
+    loop = asyncio.get_running_loop()
+    chunks = queue.Queue(maxsize=ARCHIVE_QUEUE_CHUNKS)
+    files = asyncio.Queue()
+    # Free places on `files`; the extracting thread waits for one per file
+    room = threading.Semaphore(ARCHIVE_QUEUE_FILES)
+    closed = threading.Event()
+
+    def deliver(path, text):
+        room.acquire()
+        if closed.is_set():
+            raise _ArchiveClosed
+        loop.call_soon_threadsafe(files.put_nowait, (path, text))
+
+    def extract():
+        reader = _QueueReader(chunks)
+        outcome = _ARCHIVE_DONE
+        try:
+            _extract_tar(reader, wanted, deliver)
+        except _ArchiveClosed:
+            pass
+        except Exception as e:
+            outcome = e
+        finally:
+            loop.call_soon_threadsafe(files.put_nowait, outcome)
+            # Keep consuming so the download never blocks on a full queue
+            reader.drain()
+
+    async def download():
+        try:
+            async for chunk in response.aiter_bytes(ARCHIVE_CHUNK_BYTES):
+                await asyncio.to_thread(chunks.put, chunk)
+        finally:
+            await response.aclose()
+            await asyncio.to_thread(chunks.put, None)
+
+    tasks = [
+        asyncio.create_task(download()),
+        asyncio.create_task(asyncio.to_thread(extract)),
+    ]
+    try:
+        while True:
+            item = await files.get()
+            if item is _ARCHIVE_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            room.release()
+            yield item
+    finally:
+        closed.set()
+        room.release()
+        tasks[0].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -4,3 +4,20 @@ class VCSProvider:
 
     async def get_repo_tree(self, owner, repo, ref):
         raise NotImplementedError
+
+    async def iter_repo_tree(self, owner, repo, ref, path_filter=None):
+        """
+        Async generator over tree entries, yielded as they are found.
+        Providers that list directories one by one skip the ones
+        `path_filter.allows_dir` rules out.
+        """
+        raise NotImplementedError
+        yield
+
+    async def iter_archive_files(self, owner, repo, ref, paths):
+        """
+        Async generator over `(path, text)` for `paths`, yielded as they
+        come out of one archive download.
+        """
+        raise NotImplementedError
+        yield
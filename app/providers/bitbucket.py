@@ -1,7 +1,30 @@
-import httpx
+import asyncio
+import logging
+from contextlib import aclosing
+
+from app.config import settings
+from app.path import DEFAULT_PATH_FILTER
+from app.providers.http import http_get
+from app.providers.archive import iter_archive_files
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the walk on the output queue
+_WALK_DONE = object()
+
+# Bitbucket entry types as GitHub tree types. Submodule links become
+# "commit" entries, like GitHub's, which are never listed or reviewed.
+_ENTRY_TYPES = {
+    "commit_file": "blob",
+    "commit_directory": "tree",
+    "commit_link": "commit",
+}
+
 
 class BitbucketProvider:
     API = "https://api.bitbucket.org/2.0"
+    WEB = "https://bitbucket.org"
+    PAGE_LEN = 100
 
     def __init__(self, access_token: str):
         self.headers = {
@@ -13,20 +36,78 @@ class BitbucketProvider:
         clean_path = path.lstrip("/")
         url = f"{self.API}/repositories/{workspace}/{repo}/src/{ref}/{clean_path}"
 
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url, headers=self.headers)
-            r.raise_for_status()
-            return r.text
-
-    async def get_repo_tree(self, workspace, repo, ref):
-        url = f"{self.API}/repositories/{workspace}/{repo}/src/{ref}/"
+        r = await http_get("bitbucket", url, self.headers)
+        return r.text
 
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url, headers=self.headers)
-            r.raise_for_status()
+    async def _list_directory(self, workspace, repo, ref, path):
+        """Every entry of one directory, following `next` page links."""
+        url = f"{self.API}/repositories/{workspace}/{repo}/src/{ref}/{path}?pagelen={self.PAGE_LEN}"
+        while url:
+            r = await http_get("bitbucket", url, self.headers)
             data = r.json()
+            for f in data["values"]:
+                entry_type = _ENTRY_TYPES.get(f["type"])
+                if entry_type is None:
+                    logger.warning(f"Skipping Bitbucket entry {f['path']!r} of type {f['type']!r}")
+                    continue
+                yield {
+                    "path": f["path"],
+                    "type": entry_type,
+                    "size": f.get("size"),
+                }
+            url = data.get("next")
+
+    async def iter_repo_tree(self, workspace, repo, ref, path_filter=DEFAULT_PATH_FILTER):
+        """
+        Walk the whole tree, yielding entries as directories are listed.
+        Up to BITBUCKET_TREE_CONCURRENCY directories are listed at once,
+        and directories the path filter rules out are never listed.
+        """
+        directories = asyncio.Queue()
+        found = asyncio.Queue()
+        directories.put_nowait("")
+
+        async def walker():
+            while True:
+                path = await directories.get()
+                try:
+                    async for entry in self._list_directory(workspace, repo, ref, path):
+                        if entry["type"] == "tree":
+                            if not path_filter.allows_dir(entry["path"]):
+                                continue
+                            directories.put_nowait(f"{entry['path']}/")
+                        await found.put(entry)
+                except Exception as e:
+                    await found.put(e)
+                finally:
+                    directories.task_done()
+
+        async def finish():
+            await directories.join()
+            await found.put(_WALK_DONE)
+
+        tasks = [
+            asyncio.create_task(walker())
+            for _ in range(settings.BITBUCKET_TREE_CONCURRENCY)
+        ]
+        tasks.append(asyncio.create_task(finish()))
+        try:
+            while True:
+                entry = await found.get()
+                if entry is _WALK_DONE:
+                    return
+                if isinstance(entry, Exception):
+                    raise entry
+                yield entry
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_repo_tree(self, workspace, repo, ref):
+        return [entry async for entry in self.iter_repo_tree(workspace, repo, ref)]
 
-            return [
-                {"path": f["path"], "type": "blob" if f["type"] == "commit_file" else "tree"}
-                for f in data["values"]
-            ]
+    async def iter_archive_files(self, workspace, repo, ref, paths):
+        url = f"{self.WEB}/{workspace}/{repo}/get/{ref}.tar.gz"
+        async with aclosing(iter_archive_files("bitbucket", url, self.headers, set(paths))) as files:
+            async for item in files:
+                yield item
@@ -1,4 +1,7 @@
-import httpx
+from contextlib import aclosing
+
+from app.providers.http import http_get
+from app.providers.archive import iter_archive_files
 
 class GitHubProvider:
     API = "https://api.github.com"
@@ -16,14 +19,22 @@ class GitHubProvider:
 
     async def get_file_content(self, owner, repo, ref, path):
         url = f"{self.API}/repos/{owner}/{repo}/contents/{path}?ref={ref}"
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url, headers=self.headers)
-            r.raise_for_status()
-            return r.json()
+        r = await http_get("github", url, self.headers)
+        return r.json()
 
     async def get_repo_tree(self, owner, repo, ref):
         url = f"{self.API}/repos/{owner}/{repo}/git/trees/{ref}?recursive=1"
-        async with httpx.AsyncClient() as client:
-            r = await client.get(url, headers=self.headers)
-            r.raise_for_status()
-            return r.json()["tree"]
+        r = await http_get("github", url, self.headers)
+        return r.json()["tree"]
+
+    async def iter_repo_tree(self, owner, repo, ref, path_filter=None):
+        # The recursive trees API already returns everything in one call;
+        # pruning happens in PathFilter.filter_tree.
+        for entry in await self.get_repo_tree(owner, repo, ref):
+            yield entry
+
+    async def iter_archive_files(self, owner, repo, ref, paths):
+        url = f"{self.API}/repos/{owner}/{repo}/tarball/{ref}"
+        async with aclosing(iter_archive_files("github", url, self.headers, set(paths))) as files:
+            async for item in files:
+                yield item
@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+from app.config import settings
+from app.rate_limit import call_upstream, get_limiter
+from app.providers.http_cache import (
+    http_cache,
+    http_cache_hit,
+    http_cache_miss,
+    conditional_headers,
+    response_validators,
+)
+
+# One connection pool for every provider instance. Providers are created
+# per request, so the pool has to live at module level and is closed from
+# the app lifespan.
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=settings.HTTP2_ENABLED,
+            timeout=settings.HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def http_get(upstream: str, url: str, headers: dict) -> httpx.Response:
+    """
+    GET through the shared pool, rate limited and retried per upstream.
+    Responses carrying an ETag or Last-Modified are kept in the on-disk
+    conditional cache and revalidated next time; a 304 is answered from
+    the cached body (and isn't counted against GitHub's rate limit).
+    """
+    key = meta = None
+    if settings.HTTP_CACHE_ENABLED:
+        key = http_cache.key_for(url, headers)
+        meta = await asyncio.to_thread(http_cache.validators, key)
+
+    async def fetch(meta):
+        r = await get_http_client().get(
+            url, headers={**headers, **conditional_headers(meta)}
+        )
+        get_limiter(upstream).observe(r.headers)
+        return r
+
+    async def call():
+        r = await fetch(meta)
+
+        if r.status_code == 304 and meta:
+            body = await asyncio.to_thread(http_cache.load_body, key)
+            if body is not None:
+                http_cache_hit()
+                return httpx.Response(
+                    200,
+                    content=body,
+                    headers={"Content-Type": meta.get("content_type") or "application/octet-stream"},
+                    request=r.request,
+                )
+            # The body was evicted or lost after its validators were read;
+            # ask once more without them to get the full response
+            r = await fetch(None)
+
+        r.raise_for_status()
+
+        if key is not None:
+            http_cache_miss()
+            validators = response_validators(r.headers)
+            if validators:
+                await asyncio.to_thread(http_cache.store, key, validators, r.content)
+        return r
+
+    return await call_upstream(upstream, call)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.config import settings
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+}
+
+
+class ConditionalCache:
+    """
+    On-disk store of response bodies keyed by URL + credentials, with the
+    ETag / Last-Modified needed to revalidate them. Each entry is a
+    `<key>.body` file plus a small `<key>.json` with the validators.
+    Least recently used entries are evicted past `max_bytes`. Called
+    from worker threads, hence the lock; `_index` and `_remove` expect it
+    to be held.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._sizes: OrderedDict[str, int] | None = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _index(self) -> OrderedDict:
+        if self._sizes is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            bodies = sorted(self.directory.glob("*.body"), key=lambda p: p.stat().st_mtime)
+            self._sizes = OrderedDict((p.stem, p.stat().st_size) for p in bodies)
+            self._total = sum(self._sizes.values())
+        return self._sizes
+
+    @staticmethod
+    def key_for(url: str, headers: dict) -> str:
+        # Credentials are part of the key so one user's private content is
+        # never served to another.
+        raw = f"{url}\0{headers.get('Authorization', '')}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def validators(self, key: str) -> dict | None:
+        with self._lock:
+            if key not in self._index():
+                return None
+            try:
+                return json.loads((self.directory / f"{key}.json").read_text())
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+
+    def load_body(self, key: str) -> bytes | None:
+        with self._lock:
+            try:
+                body = (self.directory / f"{key}.body").read_bytes()
+            except OSError:
+                self._remove(key)
+                return None
+            self._index().move_to_end(key)
+            os.utime(self.directory / f"{key}.body")
+            return body
+
+    def store(self, key: str, meta: dict, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            index = self._index()
+            self._remove(key)
+
+            (self.directory / f"{key}.json").write_text(json.dumps(meta))
+            (self.directory / f"{key}.body").write_bytes(body)
+            index[key] = len(body)
+            self._total += len(body)
+            _stats["stores"] += 1
+
+            while self._total > self.max_bytes and index:
+                oldest = next(iter(index))
+                self._remove(oldest)
+                _stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        size = self._index().pop(key, None)
+        if size is not None:
+            self._total -= size
+        for suffix in (".body", ".json"):
+            try:
+                (self.directory / f"{key}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self) -> dict:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._sizes or ()),
+            "bytes": self._total,
+        }
+
+
+http_cache = ConditionalCache(settings.HTTP_CACHE_DIR, settings.HTTP_CACHE_MAX_BYTES)
+
+
+def http_cache_stats() -> dict:
+    return http_cache.snapshot()
+
+
+def http_cache_hit():
+    _stats["hits"] += 1
+
+
+def http_cache_miss():
+    _stats["misses"] += 1
+
+
+def conditional_headers(meta: dict | None) -> dict:
+    if not meta:
+        return {}
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def response_validators(headers) -> dict | None:
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return None
+    return {
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": headers.get("Content-Type"),
+    }
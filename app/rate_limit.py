@@ -0,0 +1,245 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Requests default to interactive; full-review fan-out switches its tasks
+# to bulk so single-file reviews get upstream capacity first.
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# How often bulk callers re-check while interactive callers are waiting
+_BULK_YIELD_SECONDS = 0.05
+
+
+class UpstreamRateLimited(Exception):
+    """The upstream asked for a longer wait than UPSTREAM_BACKOFF_MAX_SECONDS."""
+
+    def __init__(self, name: str, seconds: float):
+        super().__init__(f"{name} rate limited for another {seconds:.0f}s")
+        self.seconds = seconds
+
+
+@contextmanager
+def bulk_priority():
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class PrioritySemaphore:
+    """
+    Semaphore that hands freed slots to waiting interactive callers
+    before bulk ones, going by the caller's upstream priority. FIFO
+    within each priority.
+    """
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self._waiters = {INTERACTIVE: deque(), BULK: deque()}
+
+    async def acquire(self):
+        if self.free > 0 and not any(self._waiters.values()):
+            self.free -= 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[_priority.get()].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancel landed; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        for priority in (INTERACTIVE, BULK):
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.free += 1
+
+
+class UpstreamLimiter:
+    """
+    Token bucket for one upstream API, plus a hard block set from
+    Retry-After / rate-limit-reset headers.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.interactive_waiting = 0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: str):
+        interactive = priority == INTERACTIVE
+        if interactive:
+            self.interactive_waiting += 1
+        try:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                    if wait > settings.UPSTREAM_BACKOFF_MAX_SECONDS:
+                        raise UpstreamRateLimited(self.name, wait)
+                    await asyncio.sleep(wait)
+                    continue
+
+                if not interactive and self.interactive_waiting:
+                    await asyncio.sleep(_BULK_YIELD_SECONDS)
+                    continue
+
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.stats["requests"] += 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        finally:
+            if interactive:
+                self.interactive_waiting -= 1
+
+    def block_for(self, seconds: float):
+        if seconds <= 0:
+            return
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.stats["throttled"] += 1
+
+    def observe(self, headers):
+        # GitHub: stop before the window runs out instead of eating 403s
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining == "0" and reset and reset.isdigit():
+            self.block_for(int(reset) - time.time())
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+        }
+
+
+_limiters: dict[str, UpstreamLimiter] = {}
+
+
+def _upstream_rates() -> dict[str, float]:
+    return {
+        "github": settings.GITHUB_REQUESTS_PER_SECOND,
+        "bitbucket": settings.BITBUCKET_REQUESTS_PER_SECOND,
+        "gemini": settings.GEMINI_REQUESTS_PER_SECOND,
+    }
+
+
+def get_limiter(name: str) -> UpstreamLimiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        rate = _upstream_rates()[name]
+        limiter = UpstreamLimiter(name, rate, burst=max(1, int(rate * 2)))
+        _limiters[name] = limiter
+    return limiter
+
+
+def rate_limit_stats() -> dict:
+    return {name: limiter.snapshot() for name, limiter in _limiters.items()}
+
+
+def _retry_after_seconds(exc: Exception) -> float | None:
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+
+    headers = exc.response.headers
+    value = headers.get("Retry-After")
+    if value:
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    reset = headers.get("X-RateLimit-Reset")
+    if headers.get("X-RateLimit-Remaining") == "0" and reset and reset.isdigit():
+        return max(0.0, int(reset) - time.time())
+    return None
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        response = exc.response
+        if response.status_code in RETRY_STATUSES:
+            return True
+        # GitHub reports an exhausted primary rate limit as 403
+        return response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0"
+    if isinstance(exc, httpx.TransportError):
+        return True
+    # google.api_core errors carry the HTTP status as `code`
+    return getattr(exc, "code", None) in RETRY_STATUSES
+
+
+async def call_upstream(name: str, call):
+    """
+    Run `call()` under the upstream's rate limit, retrying transient
+    failures with full-jitter exponential backoff (or the server's
+    Retry-After when it gives one). Raises UpstreamRateLimited rather
+    than wait longer than UPSTREAM_BACKOFF_MAX_SECONDS.
+    """
+    limiter = get_limiter(name)
+    priority = _priority.get()
+    attempts = settings.UPSTREAM_RETRY_ATTEMPTS
+
+    for attempt in range(attempts + 1):
+        await limiter.acquire(priority)
+        try:
+            return await call()
+        except Exception as exc:
+            if attempt >= attempts or not _is_transient(exc):
+                raise
+
+            delay = _retry_after_seconds(exc)
+            if delay is not None:
+                limiter.block_for(delay)
+                if delay > settings.UPSTREAM_BACKOFF_MAX_SECONDS:
+                    raise UpstreamRateLimited(name, delay) from exc
+            else:
+                delay = random.uniform(
+                    0,
+                    min(
+                        settings.UPSTREAM_BACKOFF_MAX_SECONDS,
+                        settings.UPSTREAM_BACKOFF_BASE_SECONDS * 2 ** attempt,
+                    ),
+                )
+
+            limiter.stats["retries"] += 1
+            logger.warning(f"{name} call failed ({exc!r}); retry {attempt + 1}/{attempts} in {delay:.1f}s")
+            await asyncio.sleep(delay)
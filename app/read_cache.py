@@ -0,0 +1,122 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "invalidations": 0,
+}
+
+
+class ReadCacheBackend:
+    """
+    Key/value store behind the read cache. Values are JSON-compatible, so
+    a shared implementation (e.g. Redis) can serialize them and give every
+    worker the same entries and invalidations.
+    """
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl_seconds: float):
+        raise NotImplementedError
+
+
+class MemoryReadCacheBackend(ReadCacheBackend):
+    """
+    Per-process LRU with a TTL per entry. Sync endpoints run in the
+    threadpool, hence the lock.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_backend: ReadCacheBackend = MemoryReadCacheBackend(settings.READ_CACHE_MAX_ENTRIES)
+
+
+def set_read_cache_backend(backend: ReadCacheBackend):
+    global _backend
+    _backend = backend
+
+
+def read_cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "backend": type(_backend).__name__,
+    }
+
+
+def _generation(project: str) -> str:
+    # Every key of a project embeds its current generation, so replacing
+    # the generation drops all of them at once without a key scan. A lost
+    # generation is replaced by a new random one, never reused, so
+    # entries written under an old one can't come back.
+    key = f"gen:{project}"
+    generation = _backend.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        _backend.set(key, generation, settings.READ_CACHE_TTL_SECONDS)
+    return generation
+
+
+def cached_read(endpoint: str, project: str, filename: str | None, load: Callable[[], dict]):
+    """
+    Read-through lookup of an endpoint's response for `project` (and
+    `filename`). `load` runs on a miss and its result is cached until the
+    TTL passes or the project is invalidated.
+    """
+    if not settings.READ_CACHE_ENABLED:
+        return load()
+
+    key = f"{endpoint}:{_generation(project)}:{project}:{filename or ''}"
+    value = _backend.get(key)
+    if value is not None:
+        _stats["hits"] += 1
+        return value
+
+    _stats["misses"] += 1
+    value = jsonable_encoder(load())
+    _backend.set(key, value, settings.READ_CACHE_TTL_SECONDS)
+    return value
+
+
+def invalidate_project(project: str):
+    """Call after committing new reviews for `project`."""
+    if not settings.READ_CACHE_ENABLED:
+        return
+    _backend.set(f"gen:{project}", uuid.uuid4().hex, settings.READ_CACHE_TTL_SECONDS)
+    _stats["invalidations"] += 1
@@ -0,0 +1,116 @@
+import heapq
+import itertools
+
+from app.review_result import FileReview, Metrics
+
+METRIC_KEYS = (
+    "complexity",
+    "readability",
+    "testCoverageEstimate",
+    "documentationScore",
+)
+
+# Metrics attribute behind each key of METRIC_KEYS
+METRIC_FIELDS = (
+    "complexity",
+    "readability",
+    "test_coverage_estimate",
+    "documentation_score",
+)
+
+TOP_ISSUES_LIMIT = 20
+
+# Higher ranks first in topIssues; unknown severities sort last
+SEVERITY_RANK = {"critical": 3, "major": 2, "minor": 1}
+
+
+class ProjectAggregate:
+    """
+    Running project-level totals for a full review, fed one parsed file
+    at a time so callers don't have to keep every file around. Memory is
+    O(TOP_ISSUES_LIMIT): metrics and score are running sums, and the top
+    issues are a bounded min-heap ranked by severity (ties keep the
+    earliest issue).
+    """
+
+    def __init__(self, top_issues_limit: int = TOP_ISSUES_LIMIT):
+        self.files_reviewed = 0
+        self._top_issues_limit = top_issues_limit
+        self._issue_heap = []
+        self._issue_seq = itertools.count()
+        self._score_total = 0
+        self._score_count = 0
+        self._metric_totals = dict.fromkeys(METRIC_KEYS, 0)
+
+    def add(self, review: FileReview):
+        self.files_reviewed += 1
+
+        for issue in review.issues:
+            rank = SEVERITY_RANK.get(issue.severity, 0)
+            # Later issues lose ties, hence the negated sequence number
+            item = (rank, -next(self._issue_seq), issue)
+            if len(self._issue_heap) < self._top_issues_limit:
+                heapq.heappush(self._issue_heap, item)
+            elif item[:2] > self._issue_heap[0][:2]:
+                heapq.heapreplace(self._issue_heap, item)
+
+        if review.overall_file_score is not None:
+            self._score_total += review.overall_file_score
+            self._score_count += 1
+
+        if review.metrics is not None:
+            for key, attr in zip(METRIC_KEYS, METRIC_FIELDS):
+                self._metric_totals[key] += getattr(review.metrics, attr) or 0
+
+    @property
+    def top_issues(self) -> list:
+        return [
+            issue.to_dict()
+            for _, _, issue in sorted(self._issue_heap, key=lambda item: item[:2], reverse=True)
+        ]
+
+    @property
+    def overall_score(self) -> int:
+        return self._score_total // self._score_count if self._score_count else 0
+
+    @property
+    def metrics(self) -> dict:
+        if not self.files_reviewed:
+            return dict.fromkeys(METRIC_KEYS, 0)
+        return {
+            key: round(total / self.files_reviewed)
+            for key, total in self._metric_totals.items()
+        }
+
+    def summary(self, project: str) -> dict:
+        return {
+            "project": project,
+            "mode": "full",
+            "overallProjectScore": self.overall_score,
+            "filesReviewed": self.files_reviewed,
+            "file": {"metrics": self.metrics},
+            "topIssues": self.top_issues,
+        }
+
+
+def merge_chunk_reviews(chunks) -> FileReview:
+    """
+    Merge `(line_count, review)` reviews of the chunks of one file into a
+    single file review. Issues and suggestions are concatenated; metrics
+    and the file score are averaged weighted by chunk size.
+    """
+    total_lines = sum(n for n, _ in chunks) or 1
+
+    def weighted(value_of):
+        return round(sum(n * (value_of(r) or 0) for n, r in chunks) / total_lines)
+
+    return FileReview(
+        path=chunks[0][1].path,
+        issues=[i for _, r in chunks for i in r.issues],
+        suggestions=[s for _, r in chunks for s in r.suggestions],
+        metrics=Metrics(**{
+            attr: weighted(lambda r, attr=attr: getattr(r.metrics, attr) if r.metrics else None)
+            for attr in METRIC_FIELDS
+        }),
+        overall_file_score=weighted(lambda r: r.overall_file_score),
+    )
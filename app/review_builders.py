@@ -1,10 +1,188 @@
-def add_line_numbers(code: str) -> str:
+import hashlib
+import re
+from app.config import settings
+
+# Bump whenever prompt wording or schema changes so cached reviews
+# produced by the old prompt are no longer reused.
+PROMPT_VERSION = "3"
+
+# Rough chars-per-token ratio for code; good enough for budgeting prompts.
+CHARS_PER_TOKEN = 4
+
+# Top-level lines that start a new definition in the languages we review.
+# Chunks prefer to end right before one of these.
+_DEFINITION_START = re.compile(
+    r"^(?:async\s+def|def|class|function|export|public|private|protected|"
+    r"internal|static|func|fn|pub|impl|struct|interface|type|module|@)\b"
+)
+
+
+def add_line_numbers(code: str, start_line: int = 1) -> str:
     return "\n".join(
-        f"{i+1}: {line}"
+        f"{i + start_line}: {line}"
         for i, line in enumerate(code.splitlines())
     )
 
 
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def chunk_code(content: str, max_tokens: int | None = None) -> list[tuple[int, str]]:
+    """
+    Split `content` into `(start_line, text)` chunks that each fit the
+    token budget. Cuts prefer a top-level definition boundary, then a
+    blank line, in the second half of the chunk; otherwise the chunk is
+    cut at the last line that fits. A single line longer than the budget
+    becomes its own chunk.
+    """
+    max_chars = (max_tokens or settings.REVIEW_CHUNK_MAX_TOKENS) * CHARS_PER_TOKEN
+    lines = content.splitlines()
+
+    if len(content) <= max_chars:
+        return [(1, content)]
+
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end = start
+        size = 0
+        while end < len(lines) and (end == start or size + len(lines[end]) + 1 <= max_chars):
+            size += len(lines[end]) + 1
+            end += 1
+
+        if end < len(lines):
+            halfway = start + (end - start) // 2
+            cut = next(
+                (i for i in range(end - 1, halfway, -1) if _DEFINITION_START.match(lines[i])),
+                None,
+            )
+            if cut is None:
+                cut = next(
+                    (i for i in range(end - 1, halfway, -1) if not lines[i].strip()),
+                    None,
+                )
+            if cut is not None:
+                end = cut
+
+        chunks.append((start + 1, "\n".join(lines[start:end])))
+        start = end
+
+    return chunks
+
+
+def _code_section(content: str, start_line: int, part: tuple[int, int] | None) -> str:
+    section = ""
+    if part:
+        index, count = part
+        end_line = start_line + len(content.splitlines()) - 1
+        section = (
+            f"This is part {index} of {count} of the file (lines {start_line}-{end_line}). "
+            "Review only this part; metrics and score should describe this part.\n"
+        )
+    return (
+        section
+        + "Code (with exact line numbers, use these numbers only):\n"
+        + add_line_numbers(content, start_line)
+    )
+
+
+# ---------- STATIC PROMPT PREFIX ----------
+#
+# Rubric and output schema are identical for every file, so they are built
+# once at import. Keeping them as the leading, byte-identical part of every
+# prompt also lets the model's prefix/context caching reuse them across calls.
+
+RUBRIC = (
+    "You are a senior software engineer and code reviewer.\n"
+    "Analyze the following code file for structure, maintainability, "
+    "correctness, security, performance, and documentation.\n"
+
+    "Use the following strict scoring rubric for metrics. All values must be integers 0–10.\n"
+
+    "Complexity (0–10): Measured from cyclomatic complexity, nesting depth, function length, "
+    "and number of responsibilities. Score 10 = small single-purpose functions, shallow nesting, "
+    "low branching. Score 0 = deeply nested, high branching, large god functions.\n"
+
+    "Readability (0–10): Measured from naming clarity, formatting consistency, logical flow, "
+    "and idiomatic language usage. Score 10 = self-documenting, clean, idiomatic code. "
+    "Score 0 = confusing naming, inconsistent style, hard to follow logic.\n"
+
+    "TestCoverageEstimate (0–10): Estimated from presence of tests, isolation of logic, "
+    "mockability, and coverage of error paths. Score 10 = comprehensive automated tests likely. "
+    "Score 0 = no testability or coverage indications.\n"
+
+    "DocumentationScore (0–10): Measured from quality of docstrings, comments, "
+    "and public API documentation. Score 10 = fully documented public and internal logic. "
+    "Score 0 = undocumented or misleading documentation.\n"
+
+    "OverallFileScore must be computed strictly as:\n"
+    "(Complexity * 0.25 + Readability * 0.30 + "
+    "TestCoverageEstimate * 0.20 + DocumentationScore * 0.25) * 10\n"
+
+    "Each issue object MUST also include a \"language\" field containing the file language (e.g., \"tsx\", \"python\").\n"
+    "All line references MUST use the provided line numbers exactly. Do not estimate.\n"
+)
+
+FILE_SCHEMA = (
+    "{"
+    "\"path\": string, "
+    "\"issues\": ["
+    "{"
+    "\"startLine\": number, "
+    "\"endLine\": number, "
+    "\"severity\": \"critical\"|\"major\"|\"minor\", "
+    "\"type\": string, "
+    "\"message\": string, "
+    "\"codeSnippet\": string, "
+    "\"language\": string"
+    "}"
+    "], "
+    "\"suggestions\": ["
+    "{"
+    "\"title\": string, "
+    "\"explanation\": string, "
+    "\"startLine\": number|null, "
+    "\"endLine\": number|null, "
+    "\"codeSnippet\": string|null, "
+    "\"diff_example\": string|null"
+    "}"
+    "], "
+    "\"metrics\": {"
+    "\"complexity\": number, "
+    "\"readability\": number, "
+    "\"testCoverageEstimate\": number, "
+    "\"documentationScore\": number"
+    "}, "
+    "\"overallFileScore\": number"
+    "}"
+)
+
+PROMPT_PREFIX = (
+    RUBRIC
+    + "Return ONLY a JSON object with this schema (no extra text):\n"
+    + FILE_SCHEMA
+    + "\n\n"
+)
+
+# Several small files in one call; the model answers with one schema
+# object per file wrapped in {"files": [...]}.
+BATCH_PROMPT_PREFIX = (
+    RUBRIC
+    + "You are given several files. Review each file independently. "
+    "Return ONLY a JSON object {\"files\": [...]} with exactly one entry per file, "
+    "in the order given, where \"path\" is the file path exactly as given and "
+    "each entry has this schema (no extra text):\n"
+    + FILE_SCHEMA
+    + "\n\n"
+)
+
+# Stored with cached reviews and review sessions. The hash part changes
+# automatically with the prefix, so a forgotten PROMPT_VERSION bump can't
+# serve reviews produced by a different prompt.
+PROMPT_ID = f"v{PROMPT_VERSION}-{hashlib.sha256(PROMPT_PREFIX.encode('utf-8')).hexdigest()[:12]}"
+
+
 def build_file_prompt(
     owner: str,
     repo: str,
@@ -12,164 +190,60 @@ def build_file_prompt(
     filename: str,
     language: str,
     content: str,
+    start_line: int = 1,
+    part: tuple[int, int] | None = None,
 ) -> str:
-    return (
-        "You are a senior software engineer and code reviewer.\n"
-        "Analyze the following code file for structure, maintainability, "
-        "correctness, security, performance, and documentation.\n"
-
-        "Use the following strict scoring rubric for metrics. All values must be integers 0–10.\n"
-
-        "Complexity (0–10): Measured from cyclomatic complexity, nesting depth, function length, "
-        "and number of responsibilities. Score 10 = small single-purpose functions, shallow nesting, "
-        "low branching. Score 0 = deeply nested, high branching, large god functions.\n"
-
-        "Readability (0–10): Measured from naming clarity, formatting consistency, logical flow, "
-        "and idiomatic language usage. Score 10 = self-documenting, clean, idiomatic code. "
-        "Score 0 = confusing naming, inconsistent style, hard to follow logic.\n"
-
-        "TestCoverageEstimate (0–10): Estimated from presence of tests, isolation of logic, "
-        "mockability, and coverage of error paths. Score 10 = comprehensive automated tests likely. "
-        "Score 0 = no testability or coverage indications.\n"
-
-        "DocumentationScore (0–10): Measured from quality of docstrings, comments, "
-        "and public API documentation. Score 10 = fully documented public and internal logic. "
-        "Score 0 = undocumented or misleading documentation.\n"
-
-        "OverallFileScore must be computed strictly as:\n"
-        "(Complexity * 0.25 + Readability * 0.30 + "
-        "TestCoverageEstimate * 0.20 + DocumentationScore * 0.25) * 10\n"
-
-        "Each issue object MUST also include a \"language\" field containing the file language (e.g., \"tsx\", \"python\").\n"
-        "All line references MUST use the provided line numbers exactly. Do not estimate.\n"
-        
-
-        "Return ONLY a JSON object with this schema (no extra text):\n"
-
-        "{"
-        "\"path\": string, "
-        "\"issues\": ["
-        "{"
-        "\"startLine\": number, "
-        "\"endLine\": number, "
-        "\"severity\": \"critical\"|\"major\"|\"minor\", "
-        "\"type\": string, "
-        "\"message\": string, "
-        "\"codeSnippet\": string"
-        "}"
-        "], "
-        "\"suggestions\": ["
-        "{"
-        "\"title\": string, "
-        "\"explanation\": string, "
-        "\"startLine\": number|null, "
-        "\"endLine\": number|null, "
-        "\"codeSnippet\": string|null, "
-        "\"diff_example\": string|null"
-        "}"
-        "], "
-        "\"metrics\": {"
-        "\"complexity\": number, "
-        "\"readability\": number, "
-        "\"testCoverageEstimate\": number, "
-        "\"documentationScore\": number"
-        "}, "
-        "\"overallFileScore\": number"
-        "}\n\n"
-
+    return "".join((
+        PROMPT_PREFIX,
         f"Project: {owner}/{repo}@{ref}\n"
         f"File: {filename}\n"
-        f"Language: {language}\n\n"
-        "Code (with exact line numbers, use these numbers only):\n"
-        f"{add_line_numbers(content)}"
-
-    )
+        f"Language: {language}\n\n",
+        _code_section(content, start_line, part),
+    ))
 
-MAX_CHARS = 8000  # same as n8n
 
-def build_project_prompt(
+def build_batch_prompt(
     owner: str,
     repo: str,
     ref: str,
-    filename: str,
-    language: str,
-    content: str,
+    files: list[tuple[str, str, str]],
 ) -> str:
-    # truncate like n8n
-    if len(content) > MAX_CHARS:
-        half = MAX_CHARS // 2
-        content = (
-            content[:half]
-            + "\n\n// ... file truncated ...\n\n"
-            + content[-half:]
+    """`files` is a list of `(filename, language, content)`."""
+    parts = [BATCH_PROMPT_PREFIX, f"Project: {owner}/{repo}@{ref}\n\n"]
+    for filename, language, content in files:
+        parts.append(
+            f"=== File: {filename}\n"
+            f"Language: {language}\n"
+            "Code (with exact line numbers, use these numbers only):\n"
+            f"{add_line_numbers(content)}\n\n"
         )
+    return "".join(parts)
 
-    return (
-        "You are a senior software engineer and code reviewer.\n"
-        "Analyze the following code file for structure, maintainability, "
-        "correctness, security, performance, and documentation.\n"
-
-        "Use the following strict scoring rubric for metrics. All values must be integers 0–10.\n"
-
-        "Complexity (0–10): Measured from cyclomatic complexity, nesting depth, function length, "
-        "and number of responsibilities. Score 10 = small single-purpose functions, shallow nesting, "
-        "low branching. Score 0 = deeply nested, high branching, large god functions.\n"
-
-        "Readability (0–10): Measured from naming clarity, formatting consistency, logical flow, "
-        "and idiomatic language usage. Score 10 = self-documenting, clean, idiomatic code. "
-        "Score 0 = confusing naming, inconsistent style, hard to follow logic.\n"
-
-        "TestCoverageEstimate (0–10): Estimated from presence of tests, isolation of logic, "
-        "mockability, and coverage of error paths. Score 10 = comprehensive automated tests likely. "
-        "Score 0 = no testability or coverage indications.\n"
-
-        "DocumentationScore (0–10): Measured from quality of docstrings, comments, "
-        "and public API documentation. Score 10 = fully documented public and internal logic. "
-        "Score 0 = undocumented or misleading documentation.\n"
-
-        "OverallFileScore must be computed strictly as:\n"
-        "(Complexity * 0.25 + Readability * 0.30 + "
-        "TestCoverageEstimate * 0.20 + DocumentationScore * 0.25) * 10\n"
-
-        "Each issue object MUST also include a \"language\" field containing the file language (e.g., \"tsx\", \"python\").\n"
-        "All line references MUST use the provided line numbers exactly. Do not estimate.\n"
-        "Return ONLY a JSON object with this schema (no extra text):\n"
-
-       "{"
-        "\"path\": string, "
-        "\"issues\": ["
-        "{"
-        "\"startLine\": number, "
-        "\"endLine\": number, "
-        "\"severity\": \"critical\"|\"major\"|\"minor\", "
-        "\"type\": string, "
-        "\"message\": string, "
-        "\"codeSnippet\": string, "
-        "\"language\": string"
-        "}"
-        "], "
-        "\"suggestions\": ["
-        "{"
-        "\"title\": string, "
-        "\"explanation\": string, "
-        "\"startLine\": number|null, "
-        "\"endLine\": number|null, "
-        "\"codeSnippet\": string|null, "
-        "\"diff_example\": string|null"
-        "}"
-        "], "
-        "\"metrics\": {"
-        "\"complexity\": number, "
-        "\"readability\": number, "
-        "\"testCoverageEstimate\": number, "
-        "\"documentationScore\": number"
-        "}, "
-        "\"overallFileScore\": number"
-        "}\n\n"
-        f"Project: {owner}/{repo}@{ref}\n"
-        f"File: {filename}\n"
-        f"Language: {language}\n\n"
-        "Code (with exact line numbers, use these numbers only):\n"
-        f"{add_line_numbers(content)}"
 
-    )
+# Full-project reviews use the same template; kept as its own name so the
+# two paths can diverge again without touching callers.
+build_project_prompt = build_file_prompt
+
+
+def _chunked_prompts(build, content: str, **kwargs) -> list[tuple[int, str]]:
+    chunks = chunk_code(content)
+    if len(chunks) == 1:
+        return [(len(content.splitlines()), build(content=content, **kwargs))]
+
+    return [
+        (
+            len(text.splitlines()),
+            build(content=text, start_line=start, part=(i + 1, len(chunks)), **kwargs),
+        )
+        for i, (start, text) in enumerate(chunks)
+    ]
+
+
+def build_file_prompts(**kwargs) -> list[tuple[int, str]]:
+    """`(line_count, prompt)` per chunk of the file; see chunk_code."""
+    return _chunked_prompts(build_file_prompt, **kwargs)
+
+
+def build_project_prompts(**kwargs) -> list[tuple[int, str]]:
+    """`(line_count, prompt)` per chunk of the file; see chunk_code."""
+    return _chunked_prompts(build_project_prompt, **kwargs)
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import ReviewCacheEntry
+from app.review_result import FileReview, MalformedReviewError
+
+logger = logging.getLogger(__name__)
+
+# Keys per IN (...) lookup
+CACHE_KEY_BATCH_SIZE = 500
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "evictions": 0,
+}
+
+
+def cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+
+def git_blob_sha(content: str) -> str:
+    """
+    Same hash GitHub puts on tree entries, so content fetched from other
+    providers lands on the same cache keys.
+    """
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def review_cache_key(content_sha: str, language: str, prompt_id: str, model_name: str) -> str:
+    raw = f"{content_sha}:{language}:{prompt_id}:{model_name}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cached_review(result) -> FileReview | None:
+    # Entries written before reviews were validated may not pass now;
+    # those count as misses and get replaced by a fresh review.
+    try:
+        return FileReview.from_dict(result)
+    except MalformedReviewError:
+        return None
+
+
+def cached_review_keys(db: Session, keys) -> set:
+    """
+    Which of `keys` are in the cache, without loading the reviews. Keys
+    that aren't count as misses; hits are counted when they are loaded.
+    """
+    keys = list(set(keys))
+    if not settings.REVIEW_CACHE_ENABLED or not keys:
+        return set()
+
+    found = set()
+    for start in range(0, len(keys), CACHE_KEY_BATCH_SIZE):
+        found.update(
+            key for (key,) in db.query(ReviewCacheEntry.cache_key)
+            .filter(ReviewCacheEntry.cache_key.in_(keys[start:start + CACHE_KEY_BATCH_SIZE]))
+        )
+    _stats["misses"] += len(keys) - len(found)
+    return found
+
+
+def load_cached_reviews(db: Session, keys) -> dict:
+    """Cached FileReviews for whichever of `keys` are present."""
+    keys = list(set(keys))
+    if not settings.REVIEW_CACHE_ENABLED or not keys:
+        return {}
+
+    rows = (
+        db.query(ReviewCacheEntry)
+        .filter(ReviewCacheEntry.cache_key.in_(keys))
+        .all()
+    )
+    found = {
+        row.cache_key: review
+        for row in rows
+        if (review := _cached_review(row.result)) is not None
+    }
+    _stats["hits"] += len(found)
+    _stats["misses"] += len(keys) - len(found)
+
+    if found:
+        (
+            db.query(ReviewCacheEntry)
+            .filter(ReviewCacheEntry.cache_key.in_(list(found)))
+            .update({"last_used_at": func.now()}, synchronize_session=False)
+        )
+        db.commit()
+
+    return found
+
+
+def store_cached_reviews(db: Session, entries: dict):
+    """
+    `entries` maps cache key -> FileReview. Only validated reviews ever
+    get here, so output that failed to parse is never cached. The cache
+    is best effort: a failed write is logged and the review goes on.
+    """
+    if not settings.REVIEW_CACHE_ENABLED or not entries:
+        return
+
+    try:
+        existing = {
+            key for (key,) in db.query(ReviewCacheEntry.cache_key)
+            .filter(ReviewCacheEntry.cache_key.in_(list(entries)))
+        }
+        for key, result in entries.items():
+            if key in existing:
+                continue
+            try:
+                with db.begin_nested():
+                    db.add(ReviewCacheEntry(cache_key=key, result=result.to_dict()))
+            except IntegrityError:
+                # A concurrent review of the same content stored it first
+                continue
+            _stats["stores"] += 1
+
+        db.commit()
+        evict_cached_reviews(db)
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception("Review cache write failed")
+
+
+def evict_cached_reviews(db: Session):
+    # Against the database clock, which is what writes last_used_at
+    cutoff = func.now() - timedelta(days=settings.REVIEW_CACHE_TTL_DAYS)
+    evicted = (
+        db.query(ReviewCacheEntry)
+        .filter(ReviewCacheEntry.last_used_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+
+    overflow = db.query(ReviewCacheEntry).count() - settings.REVIEW_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = (
+            db.query(ReviewCacheEntry.cache_key)
+            .order_by(ReviewCacheEntry.last_used_at.asc())
+            .limit(overflow)
+            .subquery()
+        )
+        evicted += (
+            db.query(ReviewCacheEntry)
+            .filter(ReviewCacheEntry.cache_key.in_(oldest.select()))
+            .delete(synchronize_session=False)
+        )
+
+    _stats["evictions"] += evicted
+    db.commit()
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models import ReviewJob, JobStatus, ReviewRequest
+from app.path import get_path_filter
+from app.providers.factory import get_provider
+from app.review_pipeline import list_reviewable_entries, stream_full_review
+
+logger = logging.getLogger(__name__)
+
+# Set on submit so idle workers in this process pick the job up without
+# waiting for the next poll. Created with the workers, on the server's
+# event loop; submit runs in the threadpool, hence call_soon_threadsafe.
+_wakeup: asyncio.Event | None = None
+_wakeup_loop: asyncio.AbstractEventLoop | None = None
+
+
+class JobClaimLost(Exception):
+    """The job was requeued as stale and may be running on another worker."""
+
+
+def _wake_workers():
+    if _wakeup is not None:
+        _wakeup_loop.call_soon_threadsafe(_wakeup.set)
+
+
+def submit_review_job(db: Session, req: ReviewRequest) -> ReviewJob:
+    job = ReviewJob(
+        id=str(uuid.uuid4()),
+        status=JobStatus.queued,
+        request=req.model_dump(),
+        errors=[],
+    )
+    db.add(job)
+    db.commit()
+    _wake_workers()
+    return job
+
+
+def job_to_dict(job: ReviewJob) -> dict:
+    return {
+        "jobId": job.id,
+        "status": job.status.value,
+        "progress": {
+            "filesDone": job.files_done or 0,
+            "filesTotal": job.files_total or 0,
+        },
+        "errors": job.errors or [],
+        "result": job.result,
+        "createdAt": job.created_at,
+        "updatedAt": job.updated_at,
+    }
+
+
+def _requeue_stale_jobs(db: Session):
+    # A job still "running" with no heartbeat for this long belonged to a
+    # worker that died; put it back in the queue. Compared against the
+    # database clock, which is what wrote updated_at.
+    cutoff = func.now() - timedelta(seconds=settings.REVIEW_JOB_STALE_SECONDS)
+    (
+        db.query(ReviewJob)
+        .filter(ReviewJob.status == JobStatus.running, ReviewJob.updated_at < cutoff)
+        .update({"status": JobStatus.queued, "claim_token": None}, synchronize_session=False)
+    )
+    db.commit()
+
+
+def _claim_next_job(db: Session) -> tuple[ReviewJob, str] | None:
+    candidates = (
+        db.query(ReviewJob.id)
+        .filter(ReviewJob.status == JobStatus.queued)
+        .order_by(ReviewJob.created_at.asc())
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in candidates:
+        token = str(uuid.uuid4())
+        claimed = (
+            db.query(ReviewJob)
+            .filter(ReviewJob.id == job_id, ReviewJob.status == JobStatus.queued)
+            .update({"status": JobStatus.running, "claim_token": token}, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return db.get(ReviewJob, job_id), token
+    return None
+
+
+def _update_claimed_job(db: Session, job_id: str, token: str, **values):
+    # Conditional on the token, so a worker whose job was requeued and
+    # claimed again can't overwrite the new run's progress
+    updated = (
+        db.query(ReviewJob)
+        .filter(ReviewJob.id == job_id, ReviewJob.claim_token == token)
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    if not updated:
+        raise JobClaimLost(job_id)
+
+
+def _finish_job(db: Session, job: ReviewJob, token: str, status: JobStatus, **values):
+    # The access token is only kept while the job may still need to run
+    _update_claimed_job(
+        db, job.id, token,
+        status=status,
+        request={**job.request, "accessToken": None},
+        **values,
+    )
+
+
+async def _heartbeat(job_id: str, token: str):
+    while True:
+        await asyncio.sleep(settings.REVIEW_JOB_HEARTBEAT_SECONDS)
+        db = SessionLocal()
+        try:
+            await run_db(db, lambda: _update_claimed_job(db, job_id, token, updated_at=func.now()))
+        except JobClaimLost:
+            # The run notices on its next write
+            return
+        except Exception:
+            logger.exception(f"Review job {job_id} heartbeat failed")
+        finally:
+            db.close()
+
+
+async def run_review_job(db: Session, job: ReviewJob, token: str):
+    heartbeat = asyncio.create_task(_heartbeat(job.id, token))
+    try:
+        await _run_review_job(db, job, token)
+    finally:
+        heartbeat.cancel()
+
+
+async def _run_review_job(db: Session, job: ReviewJob, token: str):
+    req = ReviewRequest(**job.request)
+    provider = get_provider(req.provider, req.accessToken)
+
+    entries = await list_reviewable_entries(
+        provider, req.owner, req.repo, req.ref, get_path_filter(req.include, req.exclude)
+    )
+
+    files_done = 0
+    errors = []
+
+    def record(event):
+        nonlocal files_done
+        if event["type"] == "file":
+            files_done += 1
+            values = {"files_done": files_done}
+        elif event["type"] == "error":
+            files_done += 1
+            errors.append(event["path"])
+            values = {"files_done": files_done, "errors": list(errors)}
+        else:
+            values = {"result": event}
+        _update_claimed_job(db, job.id, token, **values)
+
+    def start():
+        _update_claimed_job(db, job.id, token, files_total=len(entries), files_done=0, errors=[])
+
+    await run_db(db, start)
+    async for event in stream_full_review(db, provider, req, entries):
+        await run_db(db, record, event)
+
+    await run_db(db, _finish_job, db, job, token, JobStatus.done)
+
+
+async def _worker(worker_id: int):
+    while True:
+        db = SessionLocal()
+        try:
+            await run_db(db, _requeue_stale_jobs, db)
+            claim = await run_db(db, _claim_next_job, db)
+            if claim is None:
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), settings.REVIEW_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job, token = claim
+            try:
+                await run_review_job(db, job, token)
+            except JobClaimLost:
+                raise
+            except Exception as e:
+                logger.exception(f"Review job {job.id} failed")
+                error = str(e)
+
+                def fail():
+                    db.rollback()
+                    _finish_job(
+                        db, job, token, JobStatus.failed,
+                        errors=[*(job.errors or []), error],
+                    )
+
+                await run_db(db, fail)
+        except asyncio.CancelledError:
+            raise
+        except JobClaimLost as e:
+            logger.warning(f"Review job {e} was requeued while running; dropping this run")
+        except Exception:
+            logger.exception(f"Review worker {worker_id} error")
+            await asyncio.sleep(settings.REVIEW_JOB_POLL_SECONDS)
+        finally:
+            db.close()
+
+
+def start_review_workers() -> list[asyncio.Task]:
+    global _wakeup, _wakeup_loop
+    _wakeup = asyncio.Event()
+    _wakeup_loop = asyncio.get_running_loop()
+    return [
+        asyncio.create_task(_worker(i))
+        for i in range(settings.REVIEW_JOB_WORKERS)
+    ]
@@ -1,38 +1,93 @@
-from sqlalchemy.orm import Session
+import json
+import zlib
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session, selectinload
+from app.config import settings
+from app.review_builders import PROMPT_ID
+from app.gemini_service import MODEL_NAME
+from app.review_aggregate import TOP_ISSUES_LIMIT
+from app.review_result import FileReview, Issue, Suggestion, Metrics
+from app.projects import get_project_id, resolve_project_id
+from app.read_cache import invalidate_project
 from app.models import (
     ReviewSession, ReviewFile,
-    ReviewIssue, ReviewSuggestion, ReviewMetric
+    ReviewIssue, ReviewSuggestion, ReviewMetric,
+    ReviewRawOutput,
 )
 
-ALLOWED_SEVERITIES = {"critical", "major", "minor"}
+# Filenames per IN (...) lookup when matching unchanged files
+UNCHANGED_LOOKUP_BATCH_SIZE = 500
+
+
+def _store_raw_output(session: ReviewSession, response: dict):
+    if settings.REVIEW_STORE_RAW_OUTPUT:
+        data = json.dumps(response, separators=(",", ":"), default=str)
+        session.raw_output = ReviewRawOutput(payload=zlib.compress(data.encode("utf-8")))
+
+
+def load_raw_output(db: Session, session_id: int) -> dict | None:
+    row = db.get(ReviewRawOutput, session_id)
+    if not row:
+        return None
+    return json.loads(zlib.decompress(row.payload))
+
 
-def _validate_severity(value: str) -> str:
-    if value not in ALLOWED_SEVERITIES:
-        raise ValueError(f"Invalid severity '{value}' from AI")
-    return value
+def apply_session_summary(session: ReviewSession, summary: dict):
+    """Copy a ProjectAggregate summary into the session's summary columns."""
+    session.overall_score = summary["overallProjectScore"]
+    session.files_reviewed = summary["filesReviewed"]
+    session.metrics = summary["file"]["metrics"]
+    session.top_issues = summary["topIssues"]
 
 
-def save_file_review(db: Session, response: dict):
-    project = response["project"]
+def load_session_summary(session: ReviewSession) -> dict | None:
+    """
+    Score, metrics and top issues of a session, or None if it never got
+    a summary (e.g. a streamed review that was cut off).
+    """
+    if session.files_reviewed is not None:
+        return {
+            "overallProjectScore": session.overall_score or 0,
+            "metrics": session.metrics or {},
+            "topIssues": session.top_issues or [],
+        }
+
+    # Sessions from before the summary columns; loads the deferred blob
+    raw = session.raw_response
+    if not raw:
+        return None
+    return {
+        "overallProjectScore": raw.get("overallProjectScore", 0),
+        "metrics": raw.get("file", {}).get("metrics", {}),
+        "topIssues": raw.get("topIssues", []),
+    }
+
+
+def save_file_review(db: Session, response: dict, review: FileReview):
+    project_id = resolve_project_id(db, response["project"])
     filename = response["filename"]
-    file_data = response["file"]
 
     # 1. Create session (history)
     session = ReviewSession(
-        project=project,
+        project_id=project_id,
         mode=response["mode"],
         overall_score=response["overallProjectScore"],
-        raw_response=response,
+        prompt_version=PROMPT_ID,
+        model_name=MODEL_NAME,
+        files_reviewed=1,
+        metrics=review.metrics.to_dict() if review.metrics is not None else None,
+        top_issues=response["topIssues"][:TOP_ISSUES_LIMIT],
     )
+    _store_raw_output(session, response)
     db.add(session)
     db.flush()
 
     # 2. Find existing file for this project + filename
     existing_file = (
         db.query(ReviewFile)
-        .join(ReviewSession)
         .filter(
-            ReviewSession.project == project,
+            ReviewFile.project_id == project_id,
             ReviewFile.filename == filename,
         )
         .first()
@@ -41,8 +96,7 @@ def save_file_review(db: Session, response: dict):
     if existing_file:
         file = existing_file
         file.session_id = session.id
-        file.file_score = file_data.get("overallFileScore")
-        language=file_data.get("language")
+        file.file_score = review.overall_file_score
 
         db.query(ReviewIssue).filter_by(file_id=file.id).delete()
         db.query(ReviewSuggestion).filter_by(file_id=file.id).delete()
@@ -50,125 +104,268 @@ def save_file_review(db: Session, response: dict):
     else:
         file = ReviewFile(
             session_id=session.id,
+            project_id=project_id,
             filename=filename,
-            file_score=file_data.get("overallFileScore"),
+            file_score=review.overall_file_score,
             language="javascript",
         )
         db.add(file)
         db.flush()
 
     # 3. Issues (NEW SCHEMA)
-    for issue in file_data.get("issues", []):
-        db.add(ReviewIssue(
-            file_id=file.id,
-            start_line=issue.get("startLine"),
-            end_line=issue.get("endLine"),
-            severity=_validate_severity(issue["severity"]),
-            issue_type=issue.get("type"),
-            message=issue["message"],
-            code_snippet=issue.get("codeSnippet"),
-        ))
+    for issue in review.issues:
+        db.add(ReviewIssue(file_id=file.id, **_issue_row(issue)))
 
     # 4. Suggestions
-    for sug in file_data.get("suggestions", []):
-        db.add(ReviewSuggestion(
-            file_id=file.id,
-            title=sug["title"],
-            explanation=sug["explanation"],
-            diff_example=sug.get("diff_example"),
-        ))
+    for sug in review.suggestions:
+        db.add(ReviewSuggestion(file_id=file.id, **_suggestion_row(sug)))
 
     # 5. Metrics
-    metrics = file_data.get("metrics")
-    if metrics:
-        db.add(ReviewMetric(
-            file_id=file.id,
-            complexity=metrics.get("complexity"),
-            readability=metrics.get("readability"),
-            test_coverage_estimate=metrics.get("testCoverageEstimate"),
-            documentation_score=metrics.get("documentationScore"),
-        ))
+    if review.metrics is not None:
+        db.add(ReviewMetric(file_id=file.id, **_metric_row(review.metrics)))
 
     db.commit()
+    invalidate_project(response["project"])
+
+
+def _issue_row(issue: Issue) -> dict:
+    return {
+        "start_line": issue.start_line,
+        "end_line": issue.end_line,
+        "severity": issue.severity,
+        "issue_type": issue.type,
+        "message": issue.message,
+        "code_snippet": issue.code_snippet,
+    }
+
 
+def _suggestion_row(sug: Suggestion) -> dict:
+    return {
+        "title": sug.title,
+        "explanation": sug.explanation,
+        "diff_example": sug.diff_example,
+    }
 
-def save_full_review(db: Session, response: dict):
-    project = response["project"]
-    files = response["files"]
 
+def _metric_row(metrics: Metrics) -> dict:
+    return {
+        "complexity": metrics.complexity,
+        "readability": metrics.readability,
+        "test_coverage_estimate": metrics.test_coverage_estimate,
+        "documentation_score": metrics.documentation_score,
+    }
+
+
+def _normalize_filename(path: str) -> str:
+    return path if path.startswith("/") else f"/{path}"
+
+
+def save_full_review(db: Session, response: dict, reviews):
     # 1. Create session
     session = ReviewSession(
-        project=project,
+        project_id=resolve_project_id(db, response["project"]),
         mode=response["mode"],
-        overall_score=response["overallProjectScore"],
-        raw_response=response,
+        prompt_version=PROMPT_ID,
+        model_name=MODEL_NAME,
     )
+    apply_session_summary(session, response)
+    _store_raw_output(session, response)
     db.add(session)
     db.flush()
 
-    for file_data in files:
-        filename = file_data.get("filename") or file_data.get("path")
-        normalized_filename = filename if filename.startswith("/") else f"/{filename}"
+    save_review_files(db, session, reviews)
+    db.commit()
+    invalidate_project(response["project"])
+
+
+def save_review_files(db: Session, session: ReviewSession, reviews):
+    """
+    Set-based write of a batch of file reviews into `session`: one query
+    to load the project's existing files, one bulk insert/update for
+    files, one DELETE per child table and one bulk INSERT per child
+    table, whatever the number of files. The caller commits.
+    """
+    project_id = session.project_id
+
+    # Last entry wins if the model returned the same path twice
+    files = {_normalize_filename(r.path): r for r in reviews}
 
-        existing_file = (
-            db.query(ReviewFile)
-            .join(ReviewSession)
+    # 1. Prefetch every existing file for this project in one query
+    existing = {}
+    if files:
+        rows = (
+            db.query(ReviewFile.id, ReviewFile.filename)
             .filter(
-                ReviewSession.project == project,
-                ReviewFile.filename == normalized_filename,
+                ReviewFile.project_id == project_id,
+                ReviewFile.filename.in_(list(files)),
             )
-            .first()
+            .all()
+        )
+        existing = {filename: file_id for file_id, filename in rows}
+
+    # 2. Upsert files
+    if existing:
+        db.execute(
+            update(ReviewFile),
+            [
+                {
+                    "id": file_id,
+                    "session_id": session.id,
+                    "file_score": files[filename].overall_file_score,
+                    "language": "javascript",
+                    "content_sha": files[filename].sha,
+                }
+                for filename, file_id in existing.items()
+            ],
+        )
+
+        file_ids = list(existing.values())
+        db.query(ReviewIssue).filter(ReviewIssue.file_id.in_(file_ids)).delete(synchronize_session=False)
+        db.query(ReviewSuggestion).filter(ReviewSuggestion.file_id.in_(file_ids)).delete(synchronize_session=False)
+        db.query(ReviewMetric).filter(ReviewMetric.file_id.in_(file_ids)).delete(synchronize_session=False)
+
+    new_files = [
+        {
+            "session_id": session.id,
+            "project_id": project_id,
+            "filename": filename,
+            "file_score": review.overall_file_score,
+            "language": "javascript",
+            "content_sha": review.sha,
+        }
+        for filename, review in files.items()
+        if filename not in existing
+    ]
+    if new_files:
+        inserted = db.execute(
+            insert(ReviewFile).returning(ReviewFile.id, ReviewFile.filename),
+            new_files,
         )
+        existing.update({filename: file_id for file_id, filename in inserted})
+
+    # 3. Children, one bulk insert per table
+    issue_rows, suggestion_rows, metric_rows = [], [], []
+    for filename, review in files.items():
+        file_id = existing[filename]
+        issue_rows.extend({"file_id": file_id, **_issue_row(i)} for i in review.issues)
+        suggestion_rows.extend({"file_id": file_id, **_suggestion_row(s)} for s in review.suggestions)
+        if review.metrics is not None:
+            metric_rows.append({"file_id": file_id, **_metric_row(review.metrics)})
 
-        if existing_file:
-            file = existing_file
-            file.session_id = session.id
-            file.file_score = file_data.get("overallFileScore")
-            file.language = "javascript"
-
-            db.query(ReviewIssue).filter_by(file_id=file.id).delete()
-            db.query(ReviewSuggestion).filter_by(file_id=file.id).delete()
-            db.query(ReviewMetric).filter_by(file_id=file.id).delete()
-        else:
-            file = ReviewFile(
-                session_id=session.id,
-                filename=normalized_filename,
-                file_score=file_data.get("overallFileScore"),
-                language="javascript",
+    if issue_rows:
+        db.execute(insert(ReviewIssue), issue_rows)
+    if suggestion_rows:
+        db.execute(insert(ReviewSuggestion), suggestion_rows)
+    if metric_rows:
+        db.execute(insert(ReviewMetric), metric_rows)
+
+
+def _file_to_review(file: ReviewFile) -> FileReview:
+    return FileReview(
+        path=file.filename.lstrip("/"),
+        sha=file.content_sha,
+        issues=[
+            Issue(
+                severity=i.severity,
+                message=i.message,
+                start_line=i.start_line,
+                end_line=i.end_line,
+                type=i.issue_type,
+                code_snippet=i.code_snippet,
             )
-            db.add(file)
-            db.flush()
-
-        # 2. Issues (NEW SCHEMA)
-        for issue in file_data.get("issues", []):
-            db.add(ReviewIssue(
-                file_id=file.id,
-                start_line=issue.get("startLine"),
-                end_line=issue.get("endLine"),
-                severity=_validate_severity(issue["severity"]),
-                issue_type=issue.get("type"),
-                message=issue["message"],
-                code_snippet=issue.get("codeSnippet"),
-            ))
+            for i in file.issues
+        ],
+        suggestions=[
+            Suggestion(
+                title=s.title,
+                explanation=s.explanation,
+                diff_example=s.diff_example,
+            )
+            for s in file.suggestions
+        ],
+        metrics=Metrics(
+            complexity=file.metrics.complexity,
+            readability=file.metrics.readability,
+            test_coverage_estimate=file.metrics.test_coverage_estimate,
+            documentation_score=file.metrics.documentation_score,
+        ) if file.metrics else None,
+        overall_file_score=file.file_score,
+    )
 
-        # 3. Suggestions
-        for sug in file_data.get("suggestions", []):
-            db.add(ReviewSuggestion(
-                file_id=file.id,
-                title=sug["title"],
-                explanation=sug["explanation"],
-                diff_example=sug.get("diff_example"),
-            ))
 
-        # 4. Metrics
-        metrics = file_data.get("metrics")
-        if metrics:
-            db.add(ReviewMetric(
-                file_id=file.id,
-                complexity=metrics.get("complexity"),
-                readability=metrics.get("readability"),
-                test_coverage_estimate=metrics.get("testCoverageEstimate"),
-                documentation_score=metrics.get("documentationScore"),
+def _entry_shas(entries) -> dict:
+    # Stored filenames have a leading slash; entries without a sha never match
+    return {
+        e["path"] if e["path"].startswith("/") else f"/{e['path']}": e["sha"]
+        for e in entries
+        if e.get("sha")
+    }
+
+
+def _carried_forward(project_id: int, filenames):
+    # Only reviews made with the current prompt and model carry forward;
+    # after a bump unchanged files are reviewed again, as the cache does.
+    return (
+        ReviewFile.project_id == project_id,
+        ReviewFile.filename.in_(filenames),
+        ReviewFile.content_sha.isnot(None),
+        ReviewSession.prompt_version == PROMPT_ID,
+        ReviewSession.model_name == MODEL_NAME,
+    )
+
+
+def unchanged_file_paths(db: Session, project: str, entries) -> set:
+    """
+    Tree paths of entries whose blob sha matches what was reviewed last
+    time, without loading the reviews.
+    """
+    shas = _entry_shas(entries)
+    project_id = get_project_id(db, project)
+    if not shas or project_id is None:
+        return set()
+
+    filenames = list(shas)
+    unchanged = set()
+    for start in range(0, len(filenames), UNCHANGED_LOOKUP_BATCH_SIZE):
+        rows = db.execute(
+            select(ReviewFile.filename, ReviewFile.content_sha)
+            .join(ReviewSession, ReviewSession.id == ReviewFile.session_id)
+            .where(*_carried_forward(
+                project_id, filenames[start:start + UNCHANGED_LOOKUP_BATCH_SIZE]
             ))
+        )
+        unchanged.update(
+            filename.lstrip("/") for filename, content_sha in rows
+            if shas[filename] == content_sha
+        )
+    return unchanged
 
-    db.commit()
+
+def load_unchanged_file_reviews(db: Session, project: str, entries) -> dict:
+    """
+    Stored FileReviews for tree entries whose blob sha matches what was
+    reviewed last time with the current prompt and model, keyed by tree
+    path. Entries without a sha never match and have to be reviewed again.
+    """
+    shas = _entry_shas(entries)
+    project_id = get_project_id(db, project)
+    if not shas or project_id is None:
+        return {}
+
+    files = (
+        db.query(ReviewFile)
+        .join(ReviewSession, ReviewSession.id == ReviewFile.session_id)
+        .filter(*_carried_forward(project_id, list(shas)))
+        .options(
+            selectinload(ReviewFile.issues),
+            selectinload(ReviewFile.suggestions),
+            selectinload(ReviewFile.metrics),
+        )
+        .all()
+    )
+
+    return {
+        f.filename.lstrip("/"): _file_to_review(f)
+        for f in files
+        if shas.get(f.filename) == f.content_sha
+    }
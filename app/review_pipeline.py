@@ -0,0 +1,468 @@
+import asyncio
+import base64
+import logging
+from contextlib import aclosing
+
+from app.config import settings
+from app.gemini_service import review_code, MODEL_NAME
+from app.gemini_parser import parse_file_review, split_batch_review
+from app.review_builders import (
+    build_project_prompts,
+    build_batch_prompt,
+    CHARS_PER_TOKEN,
+    PROMPT_ID,
+)
+from app.review_cache import (
+    git_blob_sha,
+    review_cache_key,
+    cached_review_keys,
+    load_cached_reviews,
+    store_cached_reviews,
+)
+from app.review_persistence import (
+    save_review_files,
+    unchanged_file_paths,
+    load_unchanged_file_reviews,
+    apply_session_summary,
+)
+from app.review_aggregate import ProjectAggregate, merge_chunk_reviews
+from app.review_result import FileReview, MalformedReviewError
+from app.models import ReviewSession
+from app.database import run_db
+from app.projects import project_name, resolve_project_id
+from app.read_cache import invalidate_project
+from app.path import detect_language, DEFAULT_PATH_FILTER
+from app.rate_limit import bulk_priority
+
+logger = logging.getLogger(__name__)
+
+# Fresh reviews are written to the review cache in batches of this size
+CACHE_FLUSH_SIZE = 50
+
+# Files are persisted in batches of this size while a full review runs
+PERSIST_BATCH_SIZE = 50
+
+# Cached and carried-forward reviews are loaded in batches of this size
+# as they are yielded, never all at once
+LOAD_BATCH_SIZE = 50
+
+
+def decode_content(provider_name: str, raw) -> str:
+    # GitHub returns base64 JSON, Bitbucket returns raw text
+    if provider_name == "github":
+        return base64.b64decode(raw["content"]).decode("utf-8", errors="ignore")
+    return raw
+
+
+async def list_reviewable_entries(provider, owner, repo, ref, path_filter=DEFAULT_PATH_FILTER):
+    tree = [
+        item
+        async for item in provider.iter_repo_tree(owner, repo, ref, path_filter)
+    ]
+    return list(path_filter.filter_tree(tree))
+
+
+async def review_prompts(prompts, llm_slots: asyncio.Semaphore | None = None) -> FileReview:
+    """
+    Review the `(line_count, prompt)` chunks of one file concurrently and
+    merge them into a single file review. Chunks whose output is malformed
+    are skipped; MalformedReviewError is raised only if all of them are.
+    """
+    async def review_chunk(prompt):
+        if llm_slots is None:
+            return parse_file_review(await review_code(prompt))
+        async with llm_slots:
+            raw_review = await review_code(prompt)
+        return parse_file_review(raw_review)
+
+    if len(prompts) == 1:
+        return await review_chunk(prompts[0][1])
+
+    results = await asyncio.gather(
+        *(review_chunk(p) for _, p in prompts), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, MalformedReviewError):
+            raise result
+
+    reviewed = [(n, r) for (n, _), r in zip(prompts, results) if isinstance(r, FileReview)]
+    if not reviewed:
+        raise results[0]
+    return merge_chunk_reviews(reviewed)
+
+
+def _cache_key(content_sha: str, path: str) -> str:
+    return review_cache_key(content_sha, detect_language(path), PROMPT_ID, MODEL_NAME)
+
+
+class _UnitPlanner:
+    """
+    Groups `(index, entry)` pairs into review units as they come in.
+    Small uncached files whose tree entry reports a size are packed into
+    batches; everything else is a unit of one.
+    """
+
+    def __init__(self, cached_keys):
+        self.cached_keys = cached_keys
+        self.max_file_chars = settings.REVIEW_BATCH_FILE_MAX_TOKENS * CHARS_PER_TOKEN
+        self.max_batch_chars = settings.REVIEW_BATCH_MAX_TOKENS * CHARS_PER_TOKEN
+        self.batch, self.batch_chars = [], 0
+
+    def add(self, index: int, entry: dict) -> list[list[tuple[int, dict]]]:
+        """Units completed by this entry."""
+        size = entry.get("size")
+        small = (
+            settings.REVIEW_BATCH_ENABLED
+            and size is not None
+            and size <= self.max_file_chars
+            and not (entry.get("sha") and _cache_key(entry["sha"], entry["path"]) in self.cached_keys)
+        )
+        if not small:
+            return [[(index, entry)]]
+
+        units = []
+        if self.batch and (
+            len(self.batch) >= settings.REVIEW_BATCH_MAX_FILES
+            or self.batch_chars + size > self.max_batch_chars
+        ):
+            units.append(self.batch)
+            self.batch, self.batch_chars = [], 0
+
+        self.batch.append((index, entry))
+        self.batch_chars += size
+        return units
+
+    def finish(self) -> list[list[tuple[int, dict]]]:
+        """The last, partly filled batch, if any."""
+        units = [self.batch] if self.batch else []
+        self.batch, self.batch_chars = [], 0
+        return units
+
+
+def _plan_review_units(indexed_entries, cached_keys) -> list[list[tuple[int, dict]]]:
+    planner = _UnitPlanner(cached_keys)
+    units = []
+    for index, entry in indexed_entries:
+        units.extend(planner.add(index, entry))
+    return units + planner.finish()
+
+
+async def iter_review_project_files(db, provider, provider_name, owner, repo, ref, entries):
+    """
+    Fetch and review every tree entry concurrently, yielding
+    `(index, path, result)` as each file finishes. `result` is None for
+    files that failed to fetch or review (the failure is logged), and a
+    FileReview stamped with the entry's path and blob sha otherwise.
+
+    Entries whose blob `sha` is already in the review cache skip both the
+    fetch and the LLM call; their reviews are loaded a batch at a time as
+    they are yielded. When many files need fetching they are pulled
+    from one repository archive instead of one API call each, and reviews
+    start as files come out of the download; files the archive didn't
+    have are then fetched one by one. Small files are reviewed several per LLM call
+    and fall back to one call each if the batched answer can't be split.
+    VCS fetches and LLM calls are bounded by separate semaphores so a slow
+    model never holds a fetch slot, and the number of units in progress is
+    bounded so fetched content never piles up waiting for the model.
+    """
+    fetch_slots = asyncio.Semaphore(settings.REVIEW_FETCH_CONCURRENCY)
+    llm_slots = asyncio.Semaphore(settings.REVIEW_LLM_CONCURRENCY)
+    unit_slots = asyncio.Semaphore(
+        settings.REVIEW_FETCH_CONCURRENCY + settings.REVIEW_LLM_CONCURRENCY
+    )
+
+    cached = await run_db(
+        db,
+        cached_review_keys,
+        db,
+        [_cache_key(e["sha"], e["path"]) for e in entries if e.get("sha")],
+    )
+    fresh = {}
+
+    hits, to_fetch = [], {}
+    for index, e in enumerate(entries):
+        if e.get("sha") and _cache_key(e["sha"], e["path"]) in cached:
+            hits.append((index, e))
+        else:
+            to_fetch[e["path"]] = (index, e)
+    use_archive = bool(
+        settings.REVIEW_ARCHIVE_MIN_FILES and len(to_fetch) >= settings.REVIEW_ARCHIVE_MIN_FILES
+    )
+    # Text taken out of the archive, held until its unit fetches it
+    archived = {}
+
+    async def fetch(entry):
+        """Returns `(content, content_sha, key, cached_result)`."""
+        path = entry["path"]
+        content = archived.pop(path, None)
+        if content is None:
+            async with fetch_slots:
+                raw = await provider.get_file_content(owner, repo, ref, path)
+            content = decode_content(provider_name, raw)
+
+        if entry.get("sha"):
+            return content, entry["sha"], _cache_key(entry["sha"], path), None
+
+        # Provider gave no blob sha; hash the content ourselves.
+        content_sha = git_blob_sha(content)
+        key = _cache_key(content_sha, path)
+        hit = (await run_db(db, load_cached_reviews, db, [key])).get(key)
+        return content, content_sha, key, hit
+
+    async def review_fetched(path, content, content_sha, key):
+        prompts = build_project_prompts(
+            owner=owner,
+            repo=repo,
+            ref=ref,
+            filename=path,
+            language=detect_language(path),
+            content=content,
+        )
+        review = await review_prompts(prompts, llm_slots)
+        fresh[key] = review
+        return review.at(path, content_sha)
+
+    async def review_one(entry):
+        path = entry["path"]
+        try:
+            async with unit_slots:
+                content, content_sha, key, hit = await fetch(entry)
+                if hit:
+                    return hit.at(path, content_sha)
+                return await review_fetched(path, content, content_sha, key)
+
+        except Exception:
+            logger.exception(f"Failed reviewing file: {path}")
+            return None
+
+    async def review_batch(batch):
+        done = []
+        async with unit_slots:
+            fetched = await asyncio.gather(
+                *(fetch(entry) for _, entry in batch), return_exceptions=True
+            )
+
+            pending = []
+            for (index, entry), outcome in zip(batch, fetched):
+                path = entry["path"]
+                if isinstance(outcome, Exception):
+                    logger.error(f"Failed reviewing file: {path}", exc_info=outcome)
+                    done.append((index, path, None))
+                    continue
+
+                content, content_sha, key, hit = outcome
+                if hit:
+                    done.append((index, path, hit.at(path, content_sha)))
+                else:
+                    pending.append((index, path, content, content_sha, key))
+
+            split = {}
+            if len(pending) > 1:
+                try:
+                    prompt = build_batch_prompt(
+                        owner,
+                        repo,
+                        ref,
+                        [(path, detect_language(path), content) for _, path, content, _, _ in pending],
+                    )
+                    async with llm_slots:
+                        raw_review = await review_code(prompt)
+                    split = split_batch_review(
+                        raw_review, [path for _, path, _, _, _ in pending]
+                    )
+                except Exception:
+                    logger.exception("Batched review failed, falling back to single files")
+
+            async def finish(index, path, content, content_sha, key):
+                review = split.get(path)
+                if review is not None:
+                    fresh[key] = review
+                    return index, path, review.at(path, content_sha)
+                try:
+                    return index, path, await review_fetched(path, content, content_sha, key)
+                except Exception:
+                    logger.exception(f"Failed reviewing file: {path}")
+                    return index, path, None
+
+            done.extend(await asyncio.gather(*(finish(*p) for p in pending)))
+        return done
+
+    async def run_unit(unit):
+        if len(unit) == 1:
+            index, entry = unit[0]
+            return [(index, entry["path"], await review_one(entry))]
+        return await review_batch(unit)
+
+    done = asyncio.Queue()
+    tasks = []
+
+    def start_unit(unit, backlog: asyncio.Semaphore | None = None):
+        async def run():
+            try:
+                for reviewed in await run_unit(unit):
+                    done.put_nowait(reviewed)
+            except Exception as e:
+                done.put_nowait(e)
+            finally:
+                if backlog is not None:
+                    backlog.release()
+
+        tasks.append(asyncio.create_task(run()))
+
+    async def stream_archive():
+        # Archive units hold their text until reviewed, so only as many
+        # are started at once as can make progress; past that, waiting
+        # here pauses the download.
+        backlog = asyncio.Semaphore(
+            settings.REVIEW_FETCH_CONCURRENCY + settings.REVIEW_LLM_CONCURRENCY
+        )
+        planner = _UnitPlanner(cached)
+        try:
+            async with aclosing(
+                provider.iter_archive_files(owner, repo, ref, list(to_fetch))
+            ) as files:
+                async for path, content in files:
+                    if path not in to_fetch:
+                        continue
+                    archived[path] = content
+                    for unit in planner.add(*to_fetch.pop(path)):
+                        await backlog.acquire()
+                        start_unit(unit, backlog)
+        except Exception:
+            logger.exception("Archive fetch failed, fetching remaining files one by one")
+
+        for unit in planner.finish() + _plan_review_units(to_fetch.values(), cached):
+            start_unit(unit)
+
+    # Tasks copy the current context, so everything they send upstream
+    # queues behind interactive single-file reviews.
+    with bulk_priority():
+        if use_archive:
+            tasks.append(asyncio.create_task(stream_archive()))
+        else:
+            for unit in _plan_review_units(to_fetch.values(), cached):
+                start_unit(unit)
+
+    remaining = len(entries)
+    try:
+        for start in range(0, len(hits), LOAD_BATCH_SIZE):
+            batch = hits[start:start + LOAD_BATCH_SIZE]
+            loaded = await run_db(
+                db, load_cached_reviews, db, [_cache_key(e["sha"], e["path"]) for _, e in batch]
+            )
+            for index, entry in batch:
+                review = loaded.get(_cache_key(entry["sha"], entry["path"]))
+                if review is None:
+                    # Evicted or no longer valid since the lookup
+                    with bulk_priority():
+                        start_unit([(index, entry)])
+                    continue
+                remaining -= 1
+                yield index, entry["path"], review.at(entry["path"], entry["sha"])
+
+        for _ in range(remaining):
+            reviewed = await done.get()
+            if isinstance(reviewed, Exception):
+                raise reviewed
+            yield reviewed
+
+            if len(fresh) >= CACHE_FLUSH_SIZE:
+                # Hand over a copy; running tasks keep adding to `fresh`
+                flushed = dict(fresh)
+                fresh.clear()
+                await run_db(db, store_cached_reviews, db, flushed)
+
+        await run_db(db, store_cached_reviews, db, dict(fresh))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def review_project_files(db, provider, provider_name, owner, repo, ref, entries):
+    """
+    Review every tree entry and return the successful results in the
+    order of `entries`.
+    """
+    reviewed = [None] * len(entries)
+    async for index, _, result in iter_review_project_files(
+        db, provider, provider_name, owner, repo, ref, entries
+    ):
+        reviewed[index] = result
+    return [r for r in reviewed if r is not None]
+
+
+async def stream_full_review(db, provider, req, entries):
+    """
+    Review and persist a full project one file at a time, yielding event
+    dicts as it goes:
+
+        {"type": "file", "file": {...}}
+        {"type": "error", "path": "..."}
+        {"type": "summary", ...}
+
+    The session is created up front and files are written in batches, so
+    nothing is held for the whole repository.
+    """
+    project = project_name(req.provider, req.owner, req.repo, req.ref)
+
+    unchanged = (
+        await run_db(db, unchanged_file_paths, db, project, entries)
+        if req.incremental
+        else set()
+    )
+    carried = [e for e in entries if e["path"].lstrip("/") in unchanged]
+    pending = [e for e in entries if e["path"].lstrip("/") not in unchanged]
+
+    def create_session():
+        session = ReviewSession(
+            project_id=resolve_project_id(db, project),
+            mode="full",
+            prompt_version=PROMPT_ID,
+            model_name=MODEL_NAME,
+        )
+        db.add(session)
+        db.commit()
+        return session
+
+    def persist(files, summary=None):
+        if files:
+            save_review_files(db, session, files)
+        if summary is not None:
+            apply_session_summary(session, summary)
+        db.commit()
+        invalidate_project(project)
+
+    session = await run_db(db, create_session)
+
+    aggregate = ProjectAggregate()
+    batch = []
+
+    async def file_event(review):
+        aggregate.add(review)
+        batch.append(review)
+        if len(batch) >= PERSIST_BATCH_SIZE:
+            await run_db(db, persist, list(batch))
+            batch.clear()
+        return {"type": "file", "file": review.to_dict()}
+
+    carried_forward = 0
+    for start in range(0, len(carried), LOAD_BATCH_SIZE):
+        reviews = await run_db(
+            db, load_unchanged_file_reviews, db, project, carried[start:start + LOAD_BATCH_SIZE]
+        )
+        for review in reviews.values():
+            carried_forward += 1
+            yield await file_event(review)
+
+    async for _, path, review in iter_review_project_files(
+        db, provider, req.provider, req.owner, req.repo, req.ref, pending
+    ):
+        if review is None:
+            yield {"type": "error", "path": path}
+        else:
+            yield await file_event(review)
+
+    summary = {**aggregate.summary(project), "filesCarriedForward": carried_forward}
+    await run_db(db, persist, list(batch), summary)
+
+    yield {"type": "summary", **summary}
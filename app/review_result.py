@@ -0,0 +1,190 @@
+from dataclasses import dataclass, field, replace
+
+ALLOWED_SEVERITIES = {"critical", "major", "minor"}
+
+
+class MalformedReviewError(ValueError):
+    """Model output that isn't JSON or doesn't match the review schema."""
+
+    def __init__(self, message: str, raw_text: str | None = None):
+        super().__init__(message)
+        self.raw_text = raw_text
+
+
+def _number(data: dict, key: str, where: str):
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise MalformedReviewError(f"{where}.{key} must be a number, got {value!r}")
+    return value
+
+
+def _line(data: dict, key: str, where: str) -> int | None:
+    value = _number(data, key, where)
+    return None if value is None else int(value)
+
+
+def _text(data: dict, key: str, where: str, required: bool = False) -> str | None:
+    value = data.get(key)
+    if value is None:
+        if required:
+            raise MalformedReviewError(f"{where}.{key} is required")
+        return None
+    if not isinstance(value, str):
+        raise MalformedReviewError(f"{where}.{key} must be a string, got {value!r}")
+    return value
+
+
+def _objects(data: dict, key: str, where: str) -> list:
+    value = data.get(key)
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(v, dict) for v in value):
+        raise MalformedReviewError(f"{where}.{key} must be a list of objects")
+    return value
+
+
+@dataclass(slots=True)
+class Issue:
+    severity: str
+    message: str
+    start_line: int | None = None
+    end_line: int | None = None
+    type: str | None = None
+    code_snippet: str | None = None
+    language: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Issue":
+        severity = str(data.get("severity", "")).lower()
+        if severity not in ALLOWED_SEVERITIES:
+            raise MalformedReviewError(f"Invalid severity {data.get('severity')!r} from AI")
+        return cls(
+            severity=severity,
+            message=_text(data, "message", "issue", required=True),
+            start_line=_line(data, "startLine", "issue"),
+            end_line=_line(data, "endLine", "issue"),
+            type=_text(data, "type", "issue"),
+            code_snippet=_text(data, "codeSnippet", "issue"),
+            language=_text(data, "language", "issue"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "startLine": self.start_line,
+            "endLine": self.end_line,
+            "severity": self.severity,
+            "type": self.type,
+            "message": self.message,
+            "codeSnippet": self.code_snippet,
+            "language": self.language,
+        }
+
+
+@dataclass(slots=True)
+class Suggestion:
+    title: str
+    explanation: str
+    start_line: int | None = None
+    end_line: int | None = None
+    code_snippet: str | None = None
+    diff_example: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Suggestion":
+        return cls(
+            title=_text(data, "title", "suggestion", required=True),
+            explanation=_text(data, "explanation", "suggestion", required=True),
+            start_line=_line(data, "startLine", "suggestion"),
+            end_line=_line(data, "endLine", "suggestion"),
+            code_snippet=_text(data, "codeSnippet", "suggestion"),
+            diff_example=_text(data, "diff_example", "suggestion"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "title": self.title,
+            "explanation": self.explanation,
+            "startLine": self.start_line,
+            "endLine": self.end_line,
+            "codeSnippet": self.code_snippet,
+            "diff_example": self.diff_example,
+        }
+
+
+@dataclass(slots=True)
+class Metrics:
+    complexity: int | float | None = None
+    readability: int | float | None = None
+    test_coverage_estimate: int | float | None = None
+    documentation_score: int | float | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Metrics":
+        return cls(
+            complexity=_number(data, "complexity", "metrics"),
+            readability=_number(data, "readability", "metrics"),
+            test_coverage_estimate=_number(data, "testCoverageEstimate", "metrics"),
+            documentation_score=_number(data, "documentationScore", "metrics"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "complexity": self.complexity,
+            "readability": self.readability,
+            "testCoverageEstimate": self.test_coverage_estimate,
+            "documentationScore": self.documentation_score,
+        }
+
+
+@dataclass(slots=True)
+class FileReview:
+    """
+    One validated file review. Built once from model output (or a cached
+    or stored review) and passed as-is through aggregation and
+    persistence; `to_dict` gives the JSON shape the API returns.
+    """
+    path: str | None = None
+    issues: list[Issue] = field(default_factory=list)
+    suggestions: list[Suggestion] = field(default_factory=list)
+    metrics: Metrics | None = None
+    overall_file_score: int | float | None = None
+    sha: str | None = None
+
+    @classmethod
+    def from_dict(cls, data) -> "FileReview":
+        if not isinstance(data, dict):
+            raise MalformedReviewError("File review must be a JSON object")
+        if "issues" not in data and "overallFileScore" not in data:
+            raise MalformedReviewError("File review has neither issues nor overallFileScore")
+
+        metrics = data.get("metrics")
+        if metrics is not None and not isinstance(metrics, dict):
+            raise MalformedReviewError("file.metrics must be an object")
+
+        return cls(
+            path=_text(data, "path", "file"),
+            issues=[Issue.from_dict(i) for i in _objects(data, "issues", "file")],
+            suggestions=[Suggestion.from_dict(s) for s in _objects(data, "suggestions", "file")],
+            metrics=Metrics.from_dict(metrics) if metrics is not None else None,
+            overall_file_score=_number(data, "overallFileScore", "file"),
+            sha=_text(data, "sha", "file"),
+        )
+
+    def at(self, path: str, sha: str | None) -> "FileReview":
+        """Shallow copy stamped with the tree path and blob sha it reviews."""
+        return replace(self, path=path, sha=sha)
+
+    def to_dict(self) -> dict:
+        review = {
+            "path": self.path,
+            "issues": [i.to_dict() for i in self.issues],
+            "suggestions": [s.to_dict() for s in self.suggestions],
+            "overallFileScore": self.overall_file_score,
+        }
+        if self.metrics is not None:
+            review["metrics"] = self.metrics.to_dict()
+        if self.sha is not None:
+            review["sha"] = self.sha
+        return review
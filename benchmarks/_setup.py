@@ -0,0 +1,28 @@
+"""
+Environment for the benchmark scripts. Import it before anything under
+app/: settings are read at import time, and nothing here may reach a
+real service.
+"""
+import os
+import tempfile
+
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+for name in ("GITHUB_TOKEN", "BITBUCKET_USERNAME", "BITBUCKET_TOKEN", "GEMINI_API_KEY"):
+    os.environ.setdefault(name, "bench")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+)
+# Measure the code, not the caches or the upstream rate limits
+os.environ.setdefault("HTTP_CACHE_ENABLED", "false")
+os.environ.setdefault("READ_CACHE_ENABLED", "false")
+os.environ.setdefault("REVIEW_CACHE_ENABLED", "false")
+for name in ("GITHUB", "BITBUCKET", "GEMINI"):
+    os.environ.setdefault(f"{name}_REQUESTS_PER_SECOND", "100000")
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_big_integer(type_, compiler, **kw):
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    return "INTEGER"
@@ -0,0 +1,91 @@
+"""
+Per-file fetch latency against a local stand-in for the GitHub contents
+API: a new httpx.AsyncClient per request, as the providers used to do,
+versus GitHubProvider on the shared connection pool.
+
+    python -m benchmarks.fetch_latency [requests]
+
+The stand-in speaks plain HTTP, so "before" only pays the TCP connect;
+against api.github.com every fresh client also pays a TLS handshake.
+"""
+import benchmarks._setup  # noqa: F401
+
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.providers.github import GitHubProvider
+from app.providers.http import close_http_client
+
+BODY = json.dumps({"content": "eD0xCg==", "encoding": "base64"}).encode()
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed
+    # ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+async def fetch_with_new_client(provider, path):
+    url = f"{provider.API}/repos/o/r/contents/{path}?ref=main"
+    async with httpx.AsyncClient() as client:
+        r = await client.get(url, headers=provider.headers)
+        r.raise_for_status()
+        return r.json()
+
+
+async def fetch_pooled(provider, path):
+    return await provider.get_file_content("o", "r", "main", path)
+
+
+async def measure(fetch, provider, n):
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        await fetch(provider, f"src/f{i}.js")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    latencies.sort()
+    print(
+        f"{name:16s} mean {statistics.mean(latencies):6.2f} ms"
+        f"  p50 {latencies[len(latencies) // 2]:6.2f} ms"
+        f"  p99 {latencies[int(len(latencies) * 0.99)]:6.2f} ms"
+    )
+
+
+async def main(n):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    GitHubProvider.API = f"http://127.0.0.1:{server.server_port}"
+    provider = GitHubProvider("bench")
+
+    try:
+        report("new client", await measure(fetch_with_new_client, provider, n))
+        report("shared pool", await measure(fetch_pooled, provider, n))
+    finally:
+        await close_http_client()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
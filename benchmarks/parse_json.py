@@ -0,0 +1,98 @@
+"""
+Per-response parse time of extract_json_from_gemini over the shapes the
+model returns, built from the sample review in response.json: the old
+pipeline (two unwrap passes, three fence replaces, up to four
+json.loads) versus the single-pass fast path. "bare" is what JSON mode
+(GEMINI_JSON_MODE) returns.
+
+    python -m benchmarks.parse_json [iterations]
+"""
+import benchmarks._setup  # noqa: F401
+
+import json
+import sys
+import time
+from pathlib import Path
+
+from app.gemini_parser import extract_json_from_gemini
+
+SAMPLE = Path(__file__).resolve().parent.parent / "response.json"
+
+
+def _unwrap_once(text: str) -> str:
+    if not text:
+        return text
+    text = text.strip()
+    if not (text.startswith("{") or text.startswith("[") or text.startswith('"')):
+        return text
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, str):
+            return parsed
+        if isinstance(parsed, dict) and isinstance(parsed.get("text"), str):
+            return parsed["text"]
+    except Exception:
+        pass
+    return text
+
+
+def extract_json_before(raw_text: str):
+    # extract_json_from_gemini before the fast path
+    text = raw_text.strip()
+    text = _unwrap_once(text)
+    text = _unwrap_once(text)
+    if text.lower().startswith("text:"):
+        text = text[5:].strip()
+    text = (
+        text.replace("```json", "")
+        .replace("```diff", "")
+        .replace("```", "")
+        .strip()
+    )
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end != -1 and end > start:
+        try:
+            return json.loads(text[start : end + 1])
+        except json.JSONDecodeError as e:
+            return {"parseError": str(e)}
+    return {"parseError": "No JSON object found"}
+
+
+def make_corpus() -> tuple[dict, dict]:
+    review = json.loads(SAMPLE.read_text())["file"]
+    body = json.dumps(review, indent=2)
+    return review, {
+        "bare": body,
+        "fenced": "```json\n" + body + "\n```",
+        "prose": "Here is the review:\n```json\n" + body + "\n```\nLet me know!",
+        "text field": json.dumps({"text": "```json\n" + body + "\n```"}),
+        "json string": json.dumps(body),
+        "text: prefix": "text: " + body,
+    }
+
+
+def time_per_call(parse, text, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(text)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int):
+    review, corpus = make_corpus()
+    print(f"{'shape':12s} {'bytes':>6s} {'before':>10s} {'after':>10s}")
+    for name, text in corpus.items():
+        assert extract_json_before(text) == review
+        assert extract_json_from_gemini(text) == review
+        before = time_per_call(extract_json_before, text, iterations)
+        after = time_per_call(extract_json_from_gemini, text, iterations)
+        print(f"{name:12s} {len(text):6d} {before:8.1f}us {after:8.1f}us")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
@@ -0,0 +1,89 @@
+"""
+Filter throughput over a synthetic 500k-entry recursive tree, most of it
+under node_modules-like directories: the old per-path is_reviewable_file
+(a Path per entry, every part checked against EXCLUDED_DIRS) versus
+PathFilter.filter_tree, which prunes an excluded directory's subtree with
+one prefix check, plus a PathFilter with user include/exclude rules.
+
+    python -m benchmarks.path_filter [entries]
+"""
+import benchmarks._setup  # noqa: F401
+
+import random
+import sys
+import time
+from pathlib import Path
+
+from app.path import EXCLUDED_DIRS, REVIEWABLE_EXTENSIONS, DEFAULT_PATH_FILTER, PathFilter
+
+DIRECTORIES = {
+    "src": 25_000,
+    "src/components": 25_000,
+    "lib": 25_000,
+    "app/api": 25_000,
+    "node_modules/react/lib": 150_000,
+    "node_modules/lodash": 150_000,
+    "dist/assets": 25_000,
+    "docs": 25_000,
+    "vendor/acme": 25_000,
+    "packages/ui/src": 25_000,
+}
+EXTENSIONS = ["js", "ts", "png", "md", "map"]
+
+
+def make_tree(size: int) -> list[dict]:
+    # Depth-first, like GitHub's recursive trees API
+    rng = random.Random(1)
+    tree = []
+    for directory, n_files in DIRECTORIES.items():
+        tree.append({"path": directory, "type": "tree"})
+        tree.extend(
+            {"path": f"{directory}/f{i}.{rng.choice(EXTENSIONS)}", "type": "blob"}
+            for i in range(n_files)
+        )
+    return tree[:size]
+
+
+def is_reviewable_file_per_path(path: str) -> bool:
+    # is_reviewable_file before the compiled matcher
+    p = Path(path)
+    for part in p.parts:
+        if part in EXCLUDED_DIRS:
+            return False
+    if p.suffix == "":
+        return False
+    return p.suffix.lower() in REVIEWABLE_EXTENSIONS
+
+
+def per_path(tree):
+    return [e for e in tree if e["type"] == "blob" and is_reviewable_file_per_path(e["path"])]
+
+
+def measure(name, filter_tree, tree):
+    start = time.perf_counter()
+    kept = list(filter_tree(tree))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:22s} kept {len(kept):7d}  {elapsed * 1000:7.1f} ms"
+        f"  {len(tree) / elapsed / 1e6:6.2f}M entries/s"
+    )
+    return kept
+
+
+def main(size: int):
+    tree = make_tree(size)
+    print(f"{len(tree)} entries")
+
+    before = measure("per-path Path checks", per_path, tree)
+    after = measure("filter_tree (default)", DEFAULT_PATH_FILTER.filter_tree, tree)
+    assert after == before
+
+    rules = PathFilter(
+        include=["src/**", "packages/**/*.ts"],
+        exclude=["*.md", "docs/", "!docs/keep.md"],
+    )
+    measure("filter_tree (rules)", rules.filter_tree, tree)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
@@ -0,0 +1,167 @@
+"""
+Statements and wall time to persist a full review: the old per-file
+save_full_review (one lookup, three DELETEs, a flush and one INSERT per
+child row for every file) versus the set-based save_full_review.
+
+    python -m benchmarks.persistence [files]
+
+Each variant saves the same project twice, so the second run measures
+updating files that already exist. Runs on SQLite by default; point
+DATABASE_URL at a local Postgres to see the round-trip cost.
+"""
+import benchmarks._setup  # noqa: F401
+
+import sys
+import time
+
+from sqlalchemy import event
+
+from app.database import engine, SessionLocal
+from app.migrate import migrate
+from app.models import (
+    ReviewSession, ReviewFile,
+    ReviewIssue, ReviewSuggestion, ReviewMetric
+)
+from app.review_persistence import save_full_review
+from app.review_result import FileReview
+
+
+def make_response(project: str, n_files: int, run: int) -> dict:
+    return {
+        "project": project,
+        "mode": "full",
+        "overallProjectScore": 60,
+        "filesReviewed": n_files,
+        "file": {"metrics": {}},
+        "topIssues": [],
+        "files": [
+            {
+                "path": f"src/f{i}.js",
+                "sha": f"{run}-{i}",
+                "overallFileScore": 60,
+                "issues": [
+                    {"startLine": 1, "endLine": 2, "severity": "minor", "type": "style", "message": "m"}
+                ] * 3,
+                "suggestions": [{"title": "t", "explanation": "e"}] * 2,
+                "metrics": {
+                    "complexity": 1,
+                    "readability": 2,
+                    "testCoverageEstimate": 3,
+                    "documentationScore": 4,
+                },
+            }
+            for i in range(n_files)
+        ],
+    }
+
+
+def save_row_by_row(db, response: dict):
+    # save_full_review before the set-based rewrite
+    project = response["project"]
+    session = ReviewSession(
+        project=project,
+        mode=response["mode"],
+        overall_score=response["overallProjectScore"],
+        raw_response=response,
+    )
+    db.add(session)
+    db.flush()
+
+    for file_data in response["files"]:
+        filename = f"/{file_data['path']}"
+
+        file = (
+            db.query(ReviewFile)
+            .join(ReviewSession)
+            .filter(
+                ReviewSession.project == project,
+                ReviewFile.filename == filename,
+            )
+            .first()
+        )
+
+        if file:
+            file.session_id = session.id
+            file.file_score = file_data.get("overallFileScore")
+            file.language = "javascript"
+
+            db.query(ReviewIssue).filter_by(file_id=file.id).delete()
+            db.query(ReviewSuggestion).filter_by(file_id=file.id).delete()
+            db.query(ReviewMetric).filter_by(file_id=file.id).delete()
+        else:
+            file = ReviewFile(
+                session_id=session.id,
+                filename=filename,
+                file_score=file_data.get("overallFileScore"),
+                language="javascript",
+            )
+            db.add(file)
+            db.flush()
+
+        for issue in file_data.get("issues", []):
+            db.add(ReviewIssue(
+                file_id=file.id,
+                start_line=issue.get("startLine"),
+                end_line=issue.get("endLine"),
+                severity=issue["severity"],
+                issue_type=issue.get("type"),
+                message=issue["message"],
+                code_snippet=issue.get("codeSnippet"),
+            ))
+
+        for sug in file_data.get("suggestions", []):
+            db.add(ReviewSuggestion(
+                file_id=file.id,
+                title=sug["title"],
+                explanation=sug["explanation"],
+                diff_example=sug.get("diff_example"),
+            ))
+
+        metrics = file_data.get("metrics")
+        if metrics:
+            db.add(ReviewMetric(
+                file_id=file.id,
+                complexity=metrics.get("complexity"),
+                readability=metrics.get("readability"),
+                test_coverage_estimate=metrics.get("testCoverageEstimate"),
+                documentation_score=metrics.get("documentationScore"),
+            ))
+
+    db.commit()
+
+
+def save_set_based(db, response: dict):
+    save_full_review(db, response, [FileReview.from_dict(f) for f in response["files"]])
+
+
+def main(n_files: int):
+    migrate()
+
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    variants = [
+        ("row by row", save_row_by_row, "github:bench/before@main"),
+        ("set based", save_set_based, "github:bench/after@main"),
+    ]
+    for name, save, project in variants:
+        for run, label in enumerate(("insert", "update")):
+            response = make_response(project, n_files, run)
+            with SessionLocal() as db:
+                statements = 0
+                start = time.perf_counter()
+                save(db, response)
+                elapsed = time.perf_counter() - start
+            print(
+                f"{name:10s} {label:6s} {n_files} files:"
+                f" {statements:6d} statements {elapsed * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,153 @@
+"""
+Queries and latency per call of the /reviews/last and /reviews/files
+reads on a seeded database of 100k sessions: the old reads (join on the
+unindexed review_sessions.project, issues and metrics lazy-loaded)
+without the read-path indexes, versus the current _last_review and
+_reviewed_files with them. The read cache is off; the project id
+lookup is cached in process after the warm-up call, as in the app.
+
+    python -m benchmarks.read_path [sessions]
+"""
+import benchmarks._setup  # noqa: F401
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, text
+
+import app.main as main_module
+from app.database import engine, SessionLocal
+from app.migrate import migrate, upgrade_tables
+from app.models import (
+    Project, ReviewSession, ReviewFile,
+    ReviewIssue, ReviewMetric
+)
+from app.projects import project_name
+
+PROJECTS = 2000
+FILES_PER_PROJECT = 50
+READ_PATH_INDEXES = [
+    "ix_review_sessions_project_mode_created",
+    "ix_review_files_project_filename",
+    "ix_review_issues_file_id",
+    "ix_review_suggestions_file_id",
+]
+
+
+def seed(n_sessions: int):
+    # One file review per session, as single-file reviews write them.
+    # Rows carry both the old project string and the project id.
+    now = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Project), [
+            {"id": p + 1, "provider": "github", "owner": "o", "repo": f"r{p}", "ref": "main"}
+            for p in range(PROJECTS)
+        ])
+        conn.execute(insert(ReviewSession), [
+            {
+                "id": i,
+                "project_id": i % PROJECTS + 1,
+                "project": project_name("github", "o", f"r{i % PROJECTS}", "main"),
+                "mode": "file",
+                "overall_score": 50,
+                "files_reviewed": 1,
+                "created_at": now + timedelta(seconds=i),
+            }
+            for i in range(1, n_sessions + 1)
+        ])
+        conn.execute(insert(ReviewFile), [
+            {
+                "id": i,
+                "session_id": i,
+                "project_id": i % PROJECTS + 1,
+                "filename": f"/src/f{i % FILES_PER_PROJECT}.js",
+                "file_score": 50,
+                "language": "javascript",
+            }
+            for i in range(1, n_sessions + 1)
+        ])
+        conn.execute(insert(ReviewIssue), [
+            {"file_id": i, "severity": "minor", "message": "m"}
+            for i in range(1, n_sessions + 1)
+            for _ in range(3)
+        ])
+        conn.execute(insert(ReviewMetric), [
+            {"file_id": i, "complexity": 5} for i in range(1, n_sessions + 1)
+        ])
+
+
+def last_review_before(db, project, filename):
+    # get_last_review before the read-path rewrite
+    file = (
+        db.query(ReviewFile)
+        .join(ReviewSession)
+        .filter(
+            ReviewSession.project == project,
+            ReviewFile.filename == filename,
+        )
+        .order_by(ReviewSession.created_at.desc())
+        .first()
+    )
+    return {
+        "issues": [i.message for i in file.issues],
+        "complexity": file.metrics.complexity if file.metrics else None,
+    }
+
+
+def reviewed_files_before(db, project):
+    # list_reviewed_files before the read-path rewrite
+    files = (
+        db.query(ReviewFile.filename)
+        .join(ReviewSession)
+        .filter(ReviewSession.project == project)
+        .distinct()
+        .all()
+    )
+    return [f.filename for f in files]
+
+
+def measure(name, read, calls=50):
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    with SessionLocal() as db:
+        read(db)
+        db.expunge_all()
+        event.listen(engine, "before_cursor_execute", count)
+        start = time.perf_counter()
+        for _ in range(calls):
+            read(db)
+            db.expunge_all()
+        elapsed = time.perf_counter() - start
+        event.remove(engine, "before_cursor_execute", count)
+
+    print(f"{name:22s} {statements / calls:4.1f} queries/call {elapsed * 1000 / calls:8.2f} ms/call")
+
+
+def main(n_sessions: int):
+    migrate()
+    seed(n_sessions)
+    project = project_name("github", "o", "r7", "main")
+    filename = "/src/f7.js"
+
+    with engine.begin() as conn:
+        for index in READ_PATH_INDEXES:
+            conn.execute(text(f"DROP INDEX {index}"))
+    measure("before /reviews/last", lambda db: last_review_before(db, project, filename))
+    measure("before /reviews/files", lambda db: reviewed_files_before(db, project))
+
+    with engine.begin() as conn:
+        upgrade_tables(conn)
+    with SessionLocal() as db:
+        assert main_module._last_review(db, project, filename)["exists"]
+        assert filename in main_module._reviewed_files(db, project)["files"]
+    measure("after /reviews/last", lambda db: main_module._last_review(db, project, filename))
+    measure("after /reviews/files", lambda db: main_module._reviewed_files(db, project))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,146 @@
+"""
+Load test: p50/p99 latency of /reviews/last while full reviews are being
+reviewed and committed in the same worker. It runs twice. The first run
+has the DB work of the async handlers done inline on the event loop, as
+before run_db. The second offloads it to the bounded DB thread pool. The
+VCS provider and Gemini are local fakes; the server is a real uvicorn
+on a loopback port.
+
+    python -m benchmarks.reviews_last_load [seconds per run]
+
+N_FILES (default 1500) sets the size of each full review.
+"""
+import os
+
+os.environ.setdefault("REVIEW_JOB_WORKERS", "0")
+
+import benchmarks._setup  # noqa: F401
+
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+import app.main as main_module
+import app.review_jobs as review_jobs
+import app.review_pipeline as review_pipeline
+from app.database import run_db
+from app.migrate import migrate
+
+N_FILES = int(os.environ.get("N_FILES", 1500))
+FILE_REVIEW = {
+    "issues": [{"startLine": 1, "endLine": 1, "severity": "minor", "type": "style", "message": "m"}],
+    "suggestions": [{"title": "t", "explanation": "e"}],
+    "metrics": {"complexity": 3, "readability": 8, "testCoverageEstimate": 2, "documentationScore": 5},
+    "overallFileScore": 70,
+}
+
+
+class FakeProvider:
+    async def iter_repo_tree(self, owner, repo, ref, path_filter=None):
+        for i in range(N_FILES):
+            yield {"path": f"src/f{i}.js", "type": "blob", "sha": f"{ref}-{i}"}
+
+    async def get_file_content(self, owner, repo, ref, path):
+        return {"content": "eD0xCg=="}
+
+    async def iter_archive_files(self, owner, repo, ref, paths):
+        for path in paths:
+            yield path, "x = 1\n"
+
+
+async def fake_review_code(prompt: str) -> str:
+    await asyncio.sleep(0.001)
+    batch = re.findall(r"^=== File: (.*)$", prompt, re.M)
+    if batch:
+        return json.dumps({"files": [{"path": path, **FILE_REVIEW} for path in batch]})
+    path = re.search(r"^File: (.*)$", prompt, re.M).group(1)
+    return json.dumps({"path": path, **FILE_REVIEW})
+
+
+async def run_inline(db, fn, *args):
+    return fn(*args)
+
+
+def use_run_db(fn):
+    for module in (main_module, review_pipeline, review_jobs):
+        module.run_db = fn
+
+
+async def load(base_url: str, seconds: float) -> list[float]:
+    review = {
+        "action": "full", "provider": "github", "owner": "o", "repo": "r",
+        "ref": "main", "accessToken": "bench",
+    }
+    last = dict(provider="github", owner="o", repo="r", ref="main", filename="/src/f1.js")
+    latencies = []
+    stop = False
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        r = await client.post("/review", json=review)
+        r.raise_for_status()
+
+        async def writer(k):
+            n = 0
+            while not stop:
+                n += 1
+                r = await client.post("/review", json={**review, "ref": f"w{k}-{n}"})
+                r.raise_for_status()
+
+        async def poller():
+            while not stop:
+                start = time.perf_counter()
+                r = await client.get("/reviews/last", params=last)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert r.json()["exists"]
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(writer(k)) for k in range(2)]
+        tasks += [asyncio.create_task(poller()) for _ in range(4)]
+        await asyncio.sleep(seconds)
+        stop = True
+        await asyncio.gather(*tasks)
+
+    return sorted(latencies)
+
+
+def run(name: str, seconds: float):
+    server = uvicorn.Server(uvicorn.Config(main_module.app, port=0, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    try:
+        latencies = asyncio.run(load(f"http://127.0.0.1:{port}", seconds))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    print(
+        f"{name:22s} reads {len(latencies):5d}"
+        f"  p50 {latencies[len(latencies) // 2]:7.1f} ms"
+        f"  p99 {latencies[int(len(latencies) * 0.99)]:7.1f} ms"
+        f"  max {latencies[-1]:7.1f} ms"
+    )
+
+
+def main(seconds: float):
+    migrate()
+    main_module.get_provider = lambda *args: FakeProvider()
+    review_pipeline.review_code = fake_review_code
+
+    use_run_db(run_inline)
+    run("DB on the event loop", seconds)
+    use_run_db(run_db)
+    run("DB on the thread pool", seconds)
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Settings are read at import; nothing here talks to a real service.
+for name in ("GITHUB_TOKEN", "BITBUCKET_USERNAME", "BITBUCKET_TOKEN", "GEMINI_API_KEY"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+os.environ.setdefault("HTTP_CACHE_ENABLED", "false")
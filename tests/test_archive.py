@@ -0,0 +1,157 @@
+import asyncio
+import io
+import os
+import tarfile
+from contextlib import aclosing
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.providers import http
+from app.providers.archive import iter_archive_files
+import app.review_pipeline as review_pipeline
+
+URL = "https://codeload.example.test/o/r/tar.gz/main"
+
+
+def make_archive(files: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for path, data in files.items():
+            member = tarfile.TarInfo(f"o-r-abc123/{path}")
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class StandIn:
+    """Serves an archive through httpx.MockTransport in small chunks."""
+
+    def __init__(self, archive: bytes, chunk: int = 16 * 1024, fail_after: int | None = None):
+        self.archive = archive
+        self.chunk = chunk
+        self.fail_after = fail_after
+        self.sent = 0
+
+    async def body(self):
+        for start in range(0, len(self.archive), self.chunk):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise httpx.ReadError("connection reset")
+            self.sent += 1
+            yield self.archive[start:start + self.chunk]
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=self.body())
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    def serve(stand_in: StandIn):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(stand_in.handler))
+        monkeypatch.setattr(http, "_client", client)
+        return stand_in
+    return serve
+
+
+def collect(wanted, limit=None):
+    async def run():
+        items = []
+        async with aclosing(iter_archive_files("github", URL, {}, wanted)) as files:
+            async for item in files:
+                items.append(item)
+                if limit is not None and len(items) >= limit:
+                    break
+        return items
+    return asyncio.run(asyncio.wait_for(run(), 10))
+
+
+def test_yields_only_wanted_files(serve):
+    serve(StandIn(make_archive({
+        "src/a.py": b"a = 1\n",
+        "src/b.py": b"b = 2\n",
+        "node_modules/x.js": b"x",
+        "README.md": b"hi",
+    })))
+
+    files = dict(collect({"src/a.py", "src/b.py", "missing.py"}))
+
+    assert files == {"src/a.py": "a = 1\n", "src/b.py": "b = 2\n"}
+
+
+def test_consumer_stopping_early_stops_the_download(serve):
+    # Incompressible members, so the archive is far larger than the queues
+    stand_in = serve(StandIn(
+        make_archive({f"blob{i}.bin": os.urandom(256 * 1024) for i in range(40)}),
+        chunk=64 * 1024,
+    ))
+
+    files = collect({f"blob{i}.bin" for i in range(40)}, limit=1)
+
+    assert [path for path, _ in files] == ["blob0.bin"]
+    assert stand_in.sent < len(stand_in.archive) // stand_in.chunk
+
+
+def test_truncated_stream_raises_after_the_files_it_had(serve):
+    archive = make_archive({f"f{i}.txt": os.urandom(8 * 1024) for i in range(20)})
+    serve(StandIn(archive, chunk=4 * 1024, fail_after=len(archive) // 2))
+
+    async def run():
+        got = []
+        # The extractor sees the archive end early
+        with pytest.raises((tarfile.TarError, httpx.HTTPError)):
+            async for path, _ in iter_archive_files("github", URL, {}, {f"f{i}.txt" for i in range(20)}):
+                got.append(path)
+        return got
+
+    got = asyncio.run(asyncio.wait_for(run(), 10))
+
+    assert 0 < len(got) < 20
+    assert got == [f"f{i}.txt" for i in range(len(got))]
+
+
+class ArchiveProvider:
+    """Archive has some of the files; the rest must come from the API."""
+
+    def __init__(self, in_archive: set[str]):
+        self.in_archive = in_archive
+        self.fetched = []
+
+    async def iter_archive_files(self, owner, repo, ref, paths):
+        for path in sorted(set(paths) & self.in_archive):
+            yield path, f"# {path}\n"
+
+    async def get_file_content(self, owner, repo, ref, path):
+        self.fetched.append(path)
+        return f"# {path}\n"
+
+
+def test_pipeline_fetches_what_the_archive_lacked(monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_ARCHIVE_MIN_FILES", 1)
+    monkeypatch.setattr(settings, "REVIEW_CACHE_ENABLED", False)
+
+    async def review_code(prompt):
+        return '{"issues": [], "suggestions": [], "overallFileScore": 80}'
+
+    monkeypatch.setattr(review_pipeline, "review_code", review_code)
+
+    paths = [f"src/f{i}.py" for i in range(6)]
+    provider = ArchiveProvider(set(paths[:4]))
+    entries = [{"path": path, "sha": f"sha{i}"} for i, path in enumerate(paths)]
+
+    async def run():
+        from app.database import SessionLocal
+
+        with SessionLocal() as db:
+            return [
+                reviewed
+                async for reviewed in review_pipeline.iter_review_project_files(
+                    db, provider, "bitbucket", "o", "r", "main", entries
+                )
+            ]
+
+    results = asyncio.run(run())
+
+    assert sorted(index for index, _, _ in results) == list(range(6))
+    assert all(review is not None and review.path == path for _, path, review in results)
+    assert sorted(provider.fetched) == paths[4:]